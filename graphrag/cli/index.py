@@ -1,24 +1,41 @@
+import argparse
+import os
+
 from graphrag.index import Builder
 from graphrag.index.aligner import *
 from graphrag.index.connector import SentenceConnector
 from graphrag.index.extractor import *
 from graphrag.index.text_splitter import TokenTextSplitter
-from graphrag.llm import OpenAIModel
+from graphrag.index.utils.nlp import SpacyPipeline
+from graphrag.llm import OpenAIModel, Priority, ResponseCache
 from graphrag.utils.config import get_config
+from graphrag.utils.embedding import EmbeddingService
 
 
 def get_builder(config_path: str):
     config = get_config(config_path)
     
     # Load LLM
+    cache = None
+    if "llm_cache" in config:
+        cache = ResponseCache(
+            config["llm_cache"]["path"],
+            max_size=config["llm_cache"].get("max_size_mb", 1024) << 20,
+        )
     if "gpt" in config["llm"]:
-        llm = OpenAIModel(config["llm"])
+        llm = OpenAIModel(config["llm"], priority=Priority.BULK, cache=cache)
     else:
         # TODO: Load other LLM
         pass
     
+    if "embedding" in config:
+        EmbeddingService.set_default(EmbeddingService(**config["embedding"]))
+    
+    if "nlp" in config:
+        SpacyPipeline.configure(**config["nlp"])
+    
     entity_extractors = []
-    for extractor in config["entity_extractors"]:
+    for extractor in config.get("entity_extractors", []):
         if extractor["extractor"] == "llm":
             entity_extractors.append(LLMEntityExtractor(
                 llm,
@@ -33,15 +50,25 @@ def get_builder(config_path: str):
             ))
     
     relation_extractors = []
-    for extractor in config["relation_extractors"]:
+    for extractor in config.get("relation_extractors", []):
         if extractor["extractor"] == "llm":
             relation_extractors.append(LLMRelationExtractor(
                 llm,
                 **extractor.get("params", {})
             ))
+    
+    joint_extractors = []
+    for extractor in config.get("joint_extractors", []):
+        if extractor["extractor"] == "llm":
+            joint_extractors.append(LLMJointExtractor(
+                llm,
+                config["entity_types"],
+                **extractor.get("params", {})
+            ))
     extractor = GraphExtractor(
         ent_extractors=entity_extractors,
         rel_extractors=relation_extractors,
+        joint_extractors=joint_extractors,
     )
     
     if config["splitter"]["name"] == "token":
@@ -52,8 +79,8 @@ def get_builder(config_path: str):
         pipeline_config = config["align"]
         for method in config["align"]:
             if method["method"] == "llm":
-                method["params"] = {"llm": llm}
-        align_pipeline = AlignPipeline.from_dict(pipeline_config)
+                method["params"] = {**(method.get("params") or {}), "llm": llm}
+        align_pipeline = AlignPipeline.from_dict(pipeline_config, config.get("max_workers", 1))
     
     connector = None
     if "connector" in config:
@@ -67,4 +94,36 @@ def get_builder(config_path: str):
         extractor,
         connector,
         align_pipeline,
-    )
\ No newline at end of file
+        max_workers=config.get("max_workers", 1),
+        prep_workers=config.get("prep_workers", 2),
+        pronoun_cache_dir=config.get("pronoun_cache_dir"),
+        graph_store=config.get("graph_store", "memory"),
+        **config.get("summary", {}),
+        **config.get("ann", {}),
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Build the index of a document or a corpus.")
+    parser.add_argument("doc", help="path of the document, or a directory, glob or manifest with --corpus")
+    parser.add_argument("--corpus", action="store_true", help="index every document of a corpus")
+    parser.add_argument("--config", default=os.path.join(os.path.dirname(__file__), "index_config.yaml"))
+    parser.add_argument("--output", help="output directory, defaults to `output` of the config")
+    parser.add_argument("--replace-pronoun", action="store_true")
+    parser.add_argument("--incremental", action="store_true", help="add the document to the existing index")
+    parser.add_argument("--resume", action="store_true", help="continue a failed build from its checkpoint")
+    args = parser.parse_args()
+    
+    builder = get_builder(args.config)
+    run = builder.run_corpus if args.corpus else builder.run
+    run(
+        args.doc,
+        args.output or get_config(args.config)["output"],
+        replace_pronoun=args.replace_pronoun,
+        incremental=args.incremental,
+        resume=args.resume,
+    )
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -1,12 +1,96 @@
-from graphrag.llm import OpenAIModel
-from graphrag.query.query import generate
+import argparse
+import json
+import os
+import sys
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from graphrag.llm import OpenAIModel, Priority
+from graphrag.query.query import QueryEngine
 from graphrag.utils.config import get_config
+from graphrag.utils.embedding import EmbeddingService
 
 
-def query(query: str, data_dir: str, config_path: str) -> tuple[str, str]:
+def get_engine(data_dir: str, config_path: str) -> QueryEngine:
     config = get_config(config_path)
+    if "embedding" in config:
+        EmbeddingService.set_default(EmbeddingService(**config["embedding"]))
     if "gpt" in config["llm"]:
-        llm = OpenAIModel(config["llm"])
+        llm = OpenAIModel(config["llm"], priority=Priority.INTERACTIVE)
     else:
         pass
-    return generate(query, llm, data_dir, config["threshold"])
\ No newline at end of file
+    return QueryEngine(llm, data_dir, config["threshold"], **config.get("ann", {}), **config.get("subgraph", {}))
+
+
+def query(query: str, data_dir: str, config_path: str) -> tuple[str, str]:
+    return get_engine(data_dir, config_path).query(query)
+
+
+def repl(engine: QueryEngine):
+    """Answer questions read from stdin until EOF or an empty line."""
+    while True:
+        try:
+            question = input("> ").strip()
+        except EOFError:
+            break
+        if not question:
+            break
+        try:
+            _, response = engine.query(question)
+        except Exception as e:
+            # A failed question, e.g. an unreadable LLM answer, keeps the loaded index
+            print(f"Error: {e!r}", file=sys.stderr)
+            continue
+        print(response)
+
+
+def serve(engine: QueryEngine, host: str = "127.0.0.1", port: int = 8000):
+    """Answer `POST /query` requests with a `{"query": ...}` body, each on its own thread."""
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            if self.path != "/query":
+                self.send_error(404)
+                return
+            try:
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                question = body["query"]
+            except (ValueError, KeyError, TypeError):
+                self.send_error(400, "Expected a JSON body with a `query` field")
+                return
+            try:
+                contexts, response = engine.query(question)
+            except Exception as e:
+                self.log_error("Query %r failed: %r", question, e)
+                self.send_error(500, "Query failed", repr(e))
+                return
+            data = json.dumps({"context": str(contexts), "response": response}, ensure_ascii=False).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+    
+    with ThreadingHTTPServer((host, port), Handler) as server:
+        server.serve_forever()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Answer questions over an index, loaded once.")
+    parser.add_argument("data_dir", help="directory of the index")
+    parser.add_argument("--config", default=os.path.join(os.path.dirname(__file__), "query_config.yaml"))
+    parser.add_argument("--query", help="answer a single question, otherwise questions are read from stdin")
+    parser.add_argument("--serve", action="store_true", help="answer questions over HTTP instead")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+    
+    engine = get_engine(args.data_dir, args.config)
+    if args.serve:
+        serve(engine, args.host, args.port)
+    elif args.query:
+        print(engine.query(args.query)[1])
+    else:
+        repl(engine)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,262 @@
+import json
+import os
+import shutil
+import sqlite3
+import sys
+from abc import ABC, abstractmethod
+from typing import Any, Iterator
+
+import networkx as nx
+
+
+class GraphAccumulator(ABC):
+    """The graph merged from the subgraphs of all chunks, before summarization.
+    
+    Nodes with the same name and type are merged by appending their descriptions and text units,
+    edges between the same nodes by appending their relations. The accumulated graph and the ids
+    of the processed chunks are saved to `output`, which incremental builds start from.
+    """
+    def __init__(self, output: str) -> None:
+        self._output = output
+        # File the graph is saved to, set by subclasses
+        self._path = ""
+    
+    def exists(self) -> bool:
+        """Whether a graph was saved in `output`."""
+        return os.path.exists(self._path)
+    
+    @abstractmethod
+    def merge(self, subgraph: nx.Graph):
+        pass
+    
+    @abstractmethod
+    def iter_nodes(self, batch_size: int) -> Iterator[list[tuple[str, dict[str, Any]]]]:
+        """Yield `(name, data)` of all nodes in insertion order, `batch_size` nodes at a time."""
+        pass
+    
+    @abstractmethod
+    def iter_edges(self, batch_size: int) -> Iterator[list[tuple[str, str, dict[str, Any]]]]:
+        """Yield `(source, target, data)` of all edges, `batch_size` edges at a time."""
+        pass
+    
+    @abstractmethod
+    def load(self) -> list[str]:
+        """Load the graph saved in `output`, return the ids of the chunks it was built from."""
+        pass
+    
+    @abstractmethod
+    def save(self, chunk_ids: list[str]):
+        pass
+
+
+class MemoryGraphAccumulator(GraphAccumulator):
+    """Keep the graph in memory as a `nx.Graph`, saved as `graph_state.json`."""
+    def __init__(self, output: str) -> None:
+        super().__init__(output)
+        self._path = os.path.join(output, "graph_state.json")
+        self.graph = nx.Graph()
+    
+    def merge(self, subgraph: nx.Graph):
+        # Merge node
+        for node, data in subgraph.nodes(data=True):
+            # Existing node, smae name and type
+            if node in self.graph.nodes() and data["type"] == self.graph.nodes[node]["type"]:
+                # Merge `description` and `corpus`
+                self.graph.nodes[node]["description"].extend(data["description"])
+                if "text_units" in data:
+                    self.graph.nodes[node].setdefault("text_units", []).extend(data["text_units"])
+            else:
+                self.graph.add_node(node, **data)
+        # Merge edge
+        for source, target, data in subgraph.edges(data=True):
+            if self.graph.has_edge(source,target):
+                self.graph.edges[source, target]["relations"].extend(data["relations"])
+            else:
+                self.graph.add_edge(source, target, **data)
+    
+    def iter_nodes(self, batch_size: int) -> Iterator[list[tuple[str, dict[str, Any]]]]:
+        nodes = list(self.graph.nodes(data=True))
+        for i in range(0, len(nodes), batch_size):
+            yield nodes[i:i+batch_size]
+    
+    def iter_edges(self, batch_size: int) -> Iterator[list[tuple[str, str, dict[str, Any]]]]:
+        edges = list(self.graph.edges(data=True))
+        for i in range(0, len(edges), batch_size):
+            yield edges[i:i+batch_size]
+    
+    def load(self) -> list[str]:
+        self.graph = nx.Graph()
+        if not os.path.exists(self._path):
+            return []
+        with open(self._path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+        self.graph.add_nodes_from((node, data) for node, data in state["nodes"])
+        self.graph.add_edges_from((source, target, data) for source, target, data in state["edges"])
+        return state["chunks"]
+    
+    def save(self, chunk_ids: list[str]):
+        """Save the unsummarized graph and the processed chunks."""
+        state = {
+            "chunks": chunk_ids,
+            "nodes": [[node, data] for node, data in self.graph.nodes(data=True)],
+            "edges": [[source, target, data] for source, target, data in self.graph.edges(data=True)],
+        }
+        # Written under another name first, a failed write leaves the saved state untouched
+        tmp_path = f"{self._path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f, ensure_ascii=False)
+        os.replace(tmp_path, self._path)
+
+
+class SqliteGraphAccumulator(GraphAccumulator):
+    """Keep the graph in SQLite, only an interned index of node names stays in memory.
+    
+    Descriptions, text units and relations are appended as rows instead of growing lists, and are
+    read back in batches. The build works on a copy of `graph_state.sqlite`, which replaces it on
+    `save`, so a failed build leaves the saved state untouched.
+    """
+    def __init__(self, output: str) -> None:
+        super().__init__(output)
+        self._path = os.path.join(output, "graph_state.sqlite")
+        self._work_path = f"{self._path}.tmp"
+        self._open(fresh=True)
+    
+    def _open(self, fresh: bool):
+        os.makedirs(self._output, exist_ok=True)
+        if fresh and os.path.exists(self._work_path):
+            os.remove(self._work_path)
+        self._conn = sqlite3.connect(self._work_path, check_same_thread=False)
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS nodes (id INTEGER PRIMARY KEY, name TEXT UNIQUE NOT NULL, type TEXT NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS descriptions (node INTEGER NOT NULL, description TEXT NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS text_units (node INTEGER NOT NULL, text_unit TEXT NOT NULL);"
+            # Nodes merged with a `text_units` list, even an empty one, as the memory store keeps the key
+            "CREATE TABLE IF NOT EXISTS text_unit_nodes (node INTEGER PRIMARY KEY);"
+            "CREATE TABLE IF NOT EXISTS edges ("
+            "id INTEGER PRIMARY KEY, source INTEGER NOT NULL, target INTEGER NOT NULL,"
+            "lo INTEGER NOT NULL, hi INTEGER NOT NULL, UNIQUE (lo, hi));"
+            "CREATE TABLE IF NOT EXISTS relations (edge INTEGER NOT NULL, description TEXT NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS chunks (id TEXT NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS descriptions_node ON descriptions (node);"
+            "CREATE INDEX IF NOT EXISTS text_units_node ON text_units (node);"
+            "CREATE INDEX IF NOT EXISTS relations_edge ON relations (edge);"
+        )
+        # Node name -> (id, type)
+        self._nodes: dict[str, tuple[int, str]] = {
+            sys.intern(name): (node_id, sys.intern(type))
+            for node_id, name, type in self._conn.execute("SELECT id, name, type FROM nodes")
+        }
+    
+    def _add_node(self, name: str, data: dict[str, Any]) -> int:
+        node = self._nodes.get(name)
+        if node is None:
+            node_id = self._conn.execute("INSERT INTO nodes (name, type) VALUES (?, ?)", (name, data["type"])).lastrowid
+        elif node[1] == data["type"]:
+            node_id = node[0]
+        else:
+            # Same name but another type, the node is replaced as `nx.Graph.add_node` does
+            node_id = node[0]
+            self._conn.execute("UPDATE nodes SET type = ? WHERE id = ?", (data["type"], node_id))
+            self._conn.execute("DELETE FROM descriptions WHERE node = ?", (node_id,))
+            if "text_units" in data:
+                self._conn.execute("DELETE FROM text_units WHERE node = ?", (node_id,))
+        self._nodes[sys.intern(name)] = (node_id, sys.intern(data["type"]))
+        self._conn.executemany(
+            "INSERT INTO descriptions (node, description) VALUES (?, ?)",
+            [(node_id, description) for description in data["description"]],
+        )
+        if "text_units" in data:
+            self._conn.execute("INSERT OR IGNORE INTO text_unit_nodes (node) VALUES (?)", (node_id,))
+            self._conn.executemany(
+                "INSERT INTO text_units (node, text_unit) VALUES (?, ?)",
+                [(node_id, text_unit) for text_unit in data["text_units"]],
+            )
+        return node_id
+    
+    def merge(self, subgraph: nx.Graph):
+        with self._conn:
+            for node, data in subgraph.nodes(data=True):
+                self._add_node(node, data)
+            for source, target, data in subgraph.edges(data=True):
+                source_id, target_id = self._nodes[source][0], self._nodes[target][0]
+                lo, hi = min(source_id, target_id), max(source_id, target_id)
+                self._conn.execute(
+                    "INSERT OR IGNORE INTO edges (source, target, lo, hi) VALUES (?, ?, ?, ?)",
+                    (source_id, target_id, lo, hi),
+                )
+                edge_id = self._conn.execute("SELECT id FROM edges WHERE lo = ? AND hi = ?", (lo, hi)).fetchone()[0]
+                self._conn.executemany(
+                    "INSERT INTO relations (edge, description) VALUES (?, ?)",
+                    [(edge_id, description) for description in data["relations"]],
+                )
+    
+    def _grouped(self, sql: str, ids: list[int]) -> dict[int, list[str]]:
+        grouped: dict[int, list[str]] = {i: [] for i in ids}
+        for i, value in self._conn.execute(sql.format(",".join("?" * len(ids))), ids):
+            grouped[i].append(value)
+        return grouped
+    
+    def iter_nodes(self, batch_size: int) -> Iterator[list[tuple[str, dict[str, Any]]]]:
+        # Batches are bounded by the SQLite limit of bound parameters
+        batch_size = min(batch_size, 500)
+        last_id = 0
+        while True:
+            rows = self._conn.execute(
+                "SELECT id, name, type FROM nodes WHERE id > ? ORDER BY id LIMIT ?", (last_id, batch_size)
+            ).fetchall()
+            if not rows:
+                return
+            last_id = rows[-1][0]
+            ids = [row[0] for row in rows]
+            descriptions = self._grouped("SELECT node, description FROM descriptions WHERE node IN ({}) ORDER BY rowid", ids)
+            text_units = self._grouped("SELECT node, text_unit FROM text_units WHERE node IN ({}) ORDER BY rowid", ids)
+            with_text_units = {
+                node_id for node_id, in self._conn.execute(
+                    f"SELECT node FROM text_unit_nodes WHERE node IN ({','.join('?' * len(ids))})", ids
+                )
+            }
+            nodes = []
+            for node_id, name, type in rows:
+                data = {"type": type, "description": descriptions[node_id]}
+                # States saved before `text_unit_nodes` existed only know nodes with text units
+                if node_id in with_text_units or text_units[node_id]:
+                    data["text_units"] = text_units[node_id]
+                nodes.append((name, data))
+            yield nodes
+    
+    def iter_edges(self, batch_size: int) -> Iterator[list[tuple[str, str, dict[str, Any]]]]:
+        batch_size = min(batch_size, 500)
+        last_id = 0
+        while True:
+            rows = self._conn.execute(
+                "SELECT e.id, s.name, t.name FROM edges e "
+                "JOIN nodes s ON s.id = e.source JOIN nodes t ON t.id = e.target "
+                "WHERE e.id > ? ORDER BY e.id LIMIT ?", (last_id, batch_size)
+            ).fetchall()
+            if not rows:
+                return
+            last_id = rows[-1][0]
+            relations = self._grouped(
+                "SELECT edge, description FROM relations WHERE edge IN ({}) ORDER BY rowid", [row[0] for row in rows]
+            )
+            yield [(source, target, {"relations": relations[edge_id]}) for edge_id, source, target in rows]
+    
+    def load(self) -> list[str]:
+        self._conn.close()
+        if os.path.exists(self._path):
+            shutil.copyfile(self._path, self._work_path)
+        self._open(fresh=not os.path.exists(self._path))
+        return [chunk_id for chunk_id, in self._conn.execute("SELECT id FROM chunks ORDER BY rowid")]
+    
+    def save(self, chunk_ids: list[str]):
+        with self._conn:
+            self._conn.execute("DELETE FROM chunks")
+            self._conn.executemany("INSERT INTO chunks (id) VALUES (?)", [(chunk_id,) for chunk_id in chunk_ids])
+        self._conn.close()
+        os.replace(self._work_path, self._path)
+
+
+graph_accumulators = {
+    "memory": MemoryGraphAccumulator,
+    "sqlite": SqliteGraphAccumulator,
+}
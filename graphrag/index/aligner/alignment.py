@@ -1,53 +1,167 @@
+import inspect
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any, Callable, Dict, List, Tuple
 
-import networkx as nx
 import numpy as np
+import tiktoken
 
+from graphrag.index.utils.union_find import UnionFind
 from graphrag.llm import LLM
 from graphrag.model import Entity
 from graphrag.prompts.index.entity_alignment import ENTITY_ALIGNMENT_PROMPT
-from graphrag.utils.retrieval import get_cos_sim_matrix
+from graphrag.utils.retrieval import IVFIndex, normalize
 from graphrag.utils.transform import str2json
 
 
-def similarity_align(entities: list[Entity], threshold: float = 0.75) -> list[list[Entity]]:
-    """Cluster based on the similarity between entities"""
-    embeddings = np.array([entity.embedding for entity in entities])
-    # Calculate the cosine similarity between entities
-    sim_matrix = get_cos_sim_matrix(embeddings, embeddings)
+def _link_similar(vectors: np.ndarray,
+                  index: np.ndarray,
+                  threshold: float,
+                  block_size: int,
+                  union_find: UnionFind):
+    """Union every pair of `index` whose similarity reaches `threshold`, one tile at a time."""
+    for i in range(0, len(index), block_size):
+        rows = index[i:i+block_size]
+        row_vectors = vectors[rows]
+        # Similarity is symmetric, only tiles on and above the diagonal are computed
+        for j in range(i, len(index), block_size):
+            cols = index[j:j+block_size]
+            tile = row_vectors @ vectors[cols].T
+            row_ids, col_ids = np.nonzero(tile >= threshold)
+            if i == j:
+                mask = col_ids > row_ids
+                row_ids, col_ids = row_ids[mask], col_ids[mask]
+            for a, b in zip(rows[row_ids].tolist(), cols[col_ids].tolist()):
+                union_find.union(a, b)
+
+def _link_across(vectors: np.ndarray,
+                 rows: np.ndarray,
+                 cols: np.ndarray,
+                 threshold: float,
+                 block_size: int,
+                 union_find: UnionFind):
+    """Union every pair of a `rows` and a `cols` vector whose similarity reaches `threshold`."""
+    for i in range(0, len(rows), block_size):
+        row_block = rows[i:i+block_size]
+        row_vectors = vectors[row_block]
+        for j in range(0, len(cols), block_size):
+            col_block = cols[j:j+block_size]
+            row_ids, col_ids = np.nonzero(row_vectors @ vectors[col_block].T >= threshold)
+            for a, b in zip(row_block[row_ids].tolist(), col_block[col_ids].tolist()):
+                if a != b:
+                    union_find.union(a, b)
+
+def similarity_align(entities: list[Entity],
+                     threshold: float = 0.75,
+                     block_size: int = 2048,
+                     approximate: bool = False,
+                     n_lists: int | None = None,
+                     n_probe: int = 8,
+                     targets: list[Entity] | None = None) -> list[list[Entity]]:
+    """Cluster based on the similarity between entities
+    
+    Similarities are computed tile by tile on normalized float32 vectors, memory is bounded by
+    `block_size` whatever the number of entities. With `approximate`, entities are clustered into
+    the `n_lists` lists of an `IVFIndex` and each list is only compared with the `n_probe` lists
+    closest to it, which may miss some similar pairs. With `targets`, only pairs with one of them
+    are compared, the cost is linear in the number of entities.
+    """
+    if len(entities) < 2:
+        return []
+    vectors = normalize(np.array([entity.embedding for entity in entities]))
     
-    # Node similarity graph
-    g = nx.Graph()
-    # Filter out entity pairs with similarity higher than the threshold
-    for i in range(len(entities)):
-        for j in range(i + 1, len(entities)):
-            if sim_matrix[i][j] >= threshold:
-                g.add_edge(i, j)
+    union_find = UnionFind(len(entities))
+    if targets is not None:
+        target_ids = {entity.id for entity in targets}
+        rows = np.array([i for i, entity in enumerate(entities) if entity.id in target_ids], dtype=np.int64)
+        _link_across(vectors, rows, np.arange(len(entities)), threshold, block_size, union_find)
+    elif approximate:
+        index = IVFIndex(vectors, n_lists=n_lists, n_probe=n_probe)
+        for rows, cols in index.candidate_blocks():
+            _link_across(vectors, rows, cols, threshold, block_size, union_find)
+    else:
+        _link_similar(vectors, np.arange(len(entities)), threshold, block_size, union_find)
     
-    # Calculate the connected graph and obtain the set of all similar entities.
-    entity_sets = list(nx.connected_components(g))
+    # Sets of similar entities
+    entity_sets = union_find.groups(min_size=2)
     return [[entities[entity_id] for entity_id in entity_set] for entity_set in entity_sets]
 
-def llm_align(entities: list[Entity], llm: LLM) -> list[list[Entity]]:
-    """Using LLM for clustering"""
-    response = llm.single_turn(ENTITY_ALIGNMENT_PROMPT.format(
-        entities=[
-            {"name": entity.name, "description": entity.description}
-            for entity in entities
-        ]))
-    try:
-        entity_sets = str2json(response)
-        # Map entity_name to entity 
-        name2ent = {entity.name: entity for entity in entities}
-        final_ent_sets = []
+def _similarity_windows(entities: list[Entity], sizes: list[int], max_tokens: int) -> list[list[int]]:
+    """Group entities into windows of similar entities, each within `max_tokens`.
+    
+    A window starts from the first entity not in any window yet and is filled with its most
+    similar entities, not yet in a window first. The last quarter of the budget is filled with
+    the most similar entities regardless, so neighbouring windows overlap.
+    """
+    vectors = None
+    if all(entity.embedding is not None for entity in entities):
+        vectors = normalize(np.array([entity.embedding for entity in entities]))
+    
+    assigned = np.zeros(len(entities), dtype=bool)
+    windows = []
+    for seed in range(len(entities)):
+        if assigned[seed]:
+            continue
+        if vectors is not None:
+            candidates = np.argsort(-(vectors @ vectors[seed]), kind="stable")
+        else:
+            # Without embeddings, windows follow the original order
+            candidates = np.arange(seed, len(entities))
+        window, members, num_tokens = [], set(), 0
+        for budget, pool in ((max_tokens * 3 // 4, candidates[~assigned[candidates]]), (max_tokens, candidates)):
+            for i in pool.tolist():
+                if i in members:
+                    continue
+                # The seed is always taken, even if it exceeds the budget alone
+                if window and num_tokens + sizes[i] > budget:
+                    break
+                window.append(i)
+                members.add(i)
+                num_tokens += sizes[i]
+        assigned[window] = True
+        windows.append(window)
+    return windows
+
+def llm_align(entities: list[Entity],
+              llm: LLM,
+              max_tokens: int = 4000,
+              encoding_name: str = "cl100k_base") -> list[list[Entity]]:
+    """Using LLM for clustering
+    
+    Large sets are split into windows of similar entities within `max_tokens`, windows are sent
+    concurrently and the groups they return are merged when they share an entity.
+    """
+    encoding = tiktoken.get_encoding(encoding_name)
+    items = [{"name": entity.name, "description": entity.description} for entity in entities]
+    sizes = [len(encoding.encode(str(item))) for item in items]
+    windows = [
+        window for window in _similarity_windows(entities, sizes, max_tokens)
+        if len(window) > 1
+    ]
+    responses = llm.batch_single_turn([
+        ENTITY_ALIGNMENT_PROMPT.format(entities=[items[i] for i in window])
+        for window in windows
+    ])
+    
+    union_find = UnionFind(len(entities))
+    for window, response in zip(windows, responses):
+        try:
+            entity_sets = str2json(response)
+        except Exception:
+            # An unreadable answer aligns nothing in its window
+            continue
+        # Map entity_name to entity ids of the window
+        name2ids: dict[str, list[int]] = {}
+        for i in window:
+            name2ids.setdefault(entities[i].name, []).append(i)
         for entity_set in entity_sets:
-            final_ent_set = [name2ent[entity] for entity in entity_set if entity in name2ent.keys()]
-            # Ignore set with only on entity
-            if len(final_ent_set) > 1:
-                final_ent_sets.append(final_ent_set)
-        return final_ent_sets
-    except:
-        return [entities]
+            if not isinstance(entity_set, list):
+                continue
+            ids = [i for name in entity_set if isinstance(name, str) for i in name2ids.get(name, [])]
+            for i in ids[1:]:
+                union_find.union(ids[0], i)
+    
+    # Ignore set with only on entity
+    return [[entities[i] for i in entity_set] for entity_set in union_find.groups(min_size=2)]
 
 def type_align(entities: list[Entity]) -> list[list[Entity]]:
     """Clustering based on type"""
@@ -67,13 +181,33 @@ align_methods = {
 }
 
 class AlignPipeline:
-    def __init__(self) -> None:
+    def __init__(self, max_workers: int = 1) -> None:
         self._step: List[Tuple[Callable, dict[str, Any]]] = []
+        # Number of entity sets aligned concurrently
+        self._max_workers = max_workers
     
     def add(self, func: Callable, **params: dict[str, Any]):
         self._step.append((func, params))
     
-    def run(self, entities: list[Entity]):
+    @staticmethod
+    def _align(func: Callable,
+               params: dict[str, Any],
+               entity_set: list[Entity],
+               target_ids: set[str] | None) -> list[list[Entity]]:
+        if target_ids is None:
+            return func(entity_set, **params)
+        targets = [entity for entity in entity_set if entity.id in target_ids]
+        # Sets without a target are left as they are
+        if not targets:
+            return []
+        # Methods that support it only compare pairs with a target
+        if "targets" in inspect.signature(func).parameters:
+            return func(entity_set, **params, targets=targets)
+        return func(entity_set, **params)
+    
+    def run(self, entities: list[Entity], targets: list[Entity] | None = None):
+        """Align entities, with `targets` only sets containing one of them are aligned further."""
+        target_ids = {entity.id for entity in targets} if targets is not None else None
         # Use alignment methods sequentially
         entity_sets = [entities]
         for func, params in self._step:
@@ -81,23 +215,31 @@ class AlignPipeline:
             if not entity_sets:
                 break
             
+            # Entity sets are independent, so they are aligned concurrently
             results = []
-            for entity_set in entity_sets:
-                result = func(entity_set, **params)
-                if result:
-                    results.extend(result)
+            with ThreadPoolExecutor(max_workers=self._max_workers) as executor:
+                for result in executor.map(lambda entity_set: self._align(func, params, entity_set, target_ids), entity_sets):
+                    if result:
+                        results.extend(result)
+            if target_ids is not None:
+                results = [
+                    entity_set for entity_set in results
+                    if any(entity.id in target_ids for entity in entity_set)
+                ]
             entity_sets = results
         
         # Merge entity node
         for entity_set in entity_sets:
             for entity in entity_set:
-                # Add alias attribue to the entity
+                # Add alias attribue to the entity, keeping aliases found by earlier runs
                 # Entity ID indicating that it is the same entity as the `entity`
-                entity.alias = [ent.id for ent in entity_set if ent != entity]
+                entity.alias = list(dict.fromkeys(
+                    (entity.alias or []) + [ent.id for ent in entity_set if ent != entity]
+                ))
     
     @classmethod
-    def from_dict(cls, d: List[Dict[str, Any]])->"AlignPipeline":
-        pipeline = AlignPipeline()
+    def from_dict(cls, d: List[Dict[str, Any]], max_workers: int = 1)->"AlignPipeline":
+        pipeline = AlignPipeline(max_workers)
         for method in d:
             if method.get("params", None):
                 pipeline.add(align_methods[method["method"]], **method["params"])
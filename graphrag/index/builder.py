@@ -1,20 +1,39 @@
+import asyncio
+import hashlib
+import json
 import os
-from typing import Any
+import queue
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Iterable, Iterator
 
 import networkx as nx
+import numpy as np
 import pandas as pd
+import tiktoken
 
-from graphrag.llm import LLM
+from graphrag.llm import LLM, run_many
 from graphrag.model import *
-from graphrag.prompts.index.pronoun_replacement import PRONOUN_REPLACE_PROMPT
 from graphrag.prompts.index.summary import (
-    ENTITY_DESCRIPTION_SUMMARY_PROMPT, RELATION_DESCRIPTION_SUMMARY_PROMPT)
-from graphrag.utils.embedding import get_embedding
+    ENTITY_BATCH_SUMMARY_PROMPT, ENTITY_DESCRIPTION_SUMMARY_PROMPT,
+    RELATION_BATCH_SUMMARY_PROMPT, RELATION_DESCRIPTION_SUMMARY_PROMPT)
+from graphrag.utils.adjacency import AdjacencyGraph
+from graphrag.utils.embedding import EmbeddingService
+from graphrag.utils.retrieval import IVFIndex
+from graphrag.utils.storage import (embeddings_path, ivf_path, load_parquet,
+                                   save_embeddings)
+from graphrag.utils.transform import str2json
 
+from .accumulator import GraphAccumulator, graph_accumulators
 from .aligner import AlignPipeline
+from .checkpoint import Checkpoint
 from .connector import Connector
 from .extractor import GraphExtractor
+from .loader import iter_documents, iter_text
+from .pronoun import PronounReplacer
 from .text_splitter import TextSplitter
+from .utils.nlp import SpacyPipeline
 
 
 class Builder:
@@ -23,150 +42,557 @@ class Builder:
                  text_splitter: TextSplitter,
                  extractor: GraphExtractor,
                  connector: Connector = None,
-                 align_pipeline: AlignPipeline = None):
+                 align_pipeline: AlignPipeline = None,
+                 max_workers: int = 1,
+                 embedder: EmbeddingService = None,
+                 prep_workers: int = 2,
+                 summary_batch_size: int = 8,
+                 summary_batch_tokens: int = 2000,
+                 summary_max_tokens: int = 4000,
+                 encoding_name: str = "cl100k_base",
+                 pronoun_cache_dir: str | None = None,
+                 graph_store: str = "memory",
+                 ann_index: bool = False,
+                 ann_lists: int | None = None):
         self._llm = llm
         self._text_splitter = text_splitter
         self._extractor = extractor
         self._connector = connector
         self._align_pipeline = align_pipeline
-    
-    def _pronoun_replace(self, text: str, max_length: int = 5000) -> str:
-        res = []
-        # To avoid text exceeding the input length limit, replace it in blocks
-        for i in range(0, len(text), max_length):
-            response = self._llm.single_turn(PRONOUN_REPLACE_PROMPT.format(input_text=text[i:i+max_length]))
-            res.append(response)
-        return "".join(res)
+        self._max_workers = max_workers
+        self._prep_workers = prep_workers
+        # Chunks of a document prepared ahead of extraction
+        self._prefetch_chunks = 64
+        self._summary_batch_size = summary_batch_size
+        self._summary_batch_tokens = summary_batch_tokens
+        self._summary_max_tokens = summary_max_tokens
+        self._encoding = tiktoken.get_encoding(encoding_name)
+        self._embedder = embedder or EmbeddingService.get_default()
+        self._checkpoint: Checkpoint | None = None
+        self._pronoun_replacer = PronounReplacer(llm, pronoun_cache_dir)
+        # "memory" keeps the merged graph in memory, "sqlite" spills it to disk for large corpora
+        self._graph_store = graph_store
+        # Nodes or edges summarized and embedded together
+        self._graph_batch_size = 1024
+        # Approximate nearest-neighbour indexes of the embeddings, saved next to the outputs
+        self._ann_index = ann_index
+        self._ann_lists = ann_lists
     
     def _load_doc(self, doc_or_path: str, replace_pronoun: bool = False) -> str:
         if os.path.exists(doc_or_path):
-            if replace_pronoun:
-                # Check if there are processed doc files under this folder
-                doc_file_name = os.path.basename(doc_or_path).split(".")[0]
-                doc_dir = os.path.dirname(doc_or_path)
-                processed_doc_path = os.path.join(doc_dir, f"{doc_file_name}_processed.txt")
-                if os.path.exists(processed_doc_path):
-                    # If it exist, read the processed file directly
-                    text = open(processed_doc_path, "r", encoding="utf-8").read()
-                else:
-                    # Otherwise process original file and save the processed data
-                    raw_content = open(doc_or_path, "r", encoding="utf-8").read()
-                    text = self._pronoun_replace(raw_content)
-                    with open(processed_doc_path, "w", encoding="utf-8", newline="") as f:
-                        f.write(text)
-            else:
-                text = open(doc_or_path, "r", encoding="utf-8").read()
+            text = open(doc_or_path, "r", encoding="utf-8").read()
         else:
-            text = self._pronoun_replace(doc_or_path) if replace_pronoun else doc_or_path
+            text = doc_or_path
+        if replace_pronoun:
+            text = self._pronoun_replacer(text)
         return text.replace("\n\n", "\n")
     
-    def _merge(self, targ: nx.Graph, subgraph: nx.Graph):
-        # Merge node
-        for node, data in subgraph.nodes(data=True):
-            # Existing node, smae name and type
-            if node in targ.nodes() and data["type"] == targ.nodes[node]["type"]:
-                # Merge `description` and `corpus`
-                targ.nodes[node]["description"].extend(data["description"])
-                if self._connector:
-                    targ.nodes[node]["text_units"].extend(data["text_units"])
-            else:
-                targ.add_node(node, **data)
-        # Merge edge
-        for source, target, data in subgraph.edges(data=True):
-            if targ.has_edge(source,target):
-                targ.edges[source, target]["relations"].extend(data["relations"])
-            else:
-                targ.add_edge(source, target, **data)
+    def _process_chunk(self, chunk_id: str, chunk: str) -> tuple[nx.Graph, list[TextUnit]]:
+        if self._checkpoint:
+            result = self._checkpoint.get_chunk(chunk_id)
+            if result:
+                return result
+        # Step 3: Extract KG from the chunk
+        g = self._extractor.run(chunk)
+        # Step 4: Connect chunk to KG
+        text_units = self._connector.connect(g, chunk) if self._connector else []
+        if self._checkpoint:
+            self._checkpoint.set_chunk(chunk_id, g, text_units)
+        return g, text_units
+    
+    def _group_by_tokens(self, descs: list[str]) -> list[list[str]]:
+        """Split descriptions into consecutive groups of at most `summary_max_tokens` tokens."""
+        groups: list[list[str]] = [[]]
+        num_tokens = 0
+        for desc in descs:
+            length = len(self._encoding.encode(desc))
+            if groups[-1] and num_tokens + length > self._summary_max_tokens:
+                groups.append([])
+                num_tokens = 0
+            groups[-1].append(desc)
+            num_tokens += length
+        return groups
     
-    def _ent_summary(self, entity: str, descs: list[str]) -> str:
+    async def _hierarchical_summary(self, descs: list[str], summarize: Callable[[list[str]], Awaitable[str]]) -> str:
+        """Summarize descriptions that may exceed the token budget in map-reduce fashion.
+        
+        Groups within `summary_max_tokens` are summarized concurrently, then the partial
+        summaries are summarized the same way until they fit into a single prompt.
+        """
+        while True:
+            groups = self._group_by_tokens(descs)
+            if len(groups) == 1:
+                return await summarize(groups[0])
+            if len(groups) == len(descs):
+                # Every description exceeds the budget on its own, pair them to make progress
+                groups = [descs[i:i+2] for i in range(0, len(descs), 2)]
+            descs = list(await asyncio.gather(*(summarize(group) for group in groups)))
+    
+    async def _ent_summary(self, entity: str, descs: list[str]) -> str:
         if not descs:
             return "None"
         if len(descs) == 1:
             return descs[0]
-        response = self._llm.single_turn(
-            ENTITY_DESCRIPTION_SUMMARY_PROMPT.format(
-                entity=entity,
-                descriptions="\n".join(f"{i + 1}: {desc}" for i, desc in enumerate(descs))
-        ))
+        key = Checkpoint.key("entity", entity, descs)
+        if self._checkpoint:
+            # Checkpoint I/O runs in a worker thread, off the event loop of the summary requests
+            response = await asyncio.to_thread(self._checkpoint.get_summary, key)
+            if response is not None:
+                return response
+        async def summarize(group: list[str]) -> str:
+            return await self._llm.session().single_turn(
+                ENTITY_DESCRIPTION_SUMMARY_PROMPT.format(
+                    entity=entity,
+                    descriptions="\n".join(f"{i + 1}: {desc}" for i, desc in enumerate(group))
+            ))
+        response = await self._hierarchical_summary(descs, summarize)
+        if self._checkpoint and response:
+            await asyncio.to_thread(self._checkpoint.set_summary, key, response)
         return response
     
-    def _rel_summary(self, source: str, target: str, descs: list[str]) -> str:
+    async def _rel_summary(self, source: str, target: str, descs: list[str]) -> str:
         if not descs:
             return "None"
         if len(descs) == 1:
             return descs[0]
-        response = self._llm.single_turn(
-            RELATION_DESCRIPTION_SUMMARY_PROMPT.format(
-                source=source,
-                target=target,
-                descriptions="\n".join(f"{i + 1}: {desc}" for i, desc in enumerate(descs))
-        ))
+        key = Checkpoint.key("relation", source, target, descs)
+        if self._checkpoint:
+            # Checkpoint I/O runs in a worker thread, off the event loop of the summary requests
+            response = await asyncio.to_thread(self._checkpoint.get_summary, key)
+            if response is not None:
+                return response
+        async def summarize(group: list[str]) -> str:
+            return await self._llm.session().single_turn(
+                RELATION_DESCRIPTION_SUMMARY_PROMPT.format(
+                    source=source,
+                    target=target,
+                    descriptions="\n".join(f"{i + 1}: {desc}" for i, desc in enumerate(group))
+            ))
+        response = await self._hierarchical_summary(descs, summarize)
+        if self._checkpoint and response:
+            await asyncio.to_thread(self._checkpoint.set_summary, key, response)
         return response
     
+    async def _item_summary(self, kind: str, names: tuple[str, ...], descs: list[str]) -> str:
+        if kind == "entity":
+            return await self._ent_summary(*names, descs)
+        return await self._rel_summary(*names, descs)
+    
+    async def _batch_summary(self, kind: str, items: list[tuple[tuple[str, ...], list[str]]]) -> list[str]:
+        """Summarize several items with one request, items missing from the response are summarized one by one."""
+        if kind == "entity":
+            prompt = ENTITY_BATCH_SUMMARY_PROMPT.format(entities=json.dumps([
+                {"key": str(i), "entity": entity, "descriptions": descs}
+                for i, ((entity,), descs) in enumerate(items)
+            ], ensure_ascii=False, indent=1))
+        else:
+            prompt = RELATION_BATCH_SUMMARY_PROMPT.format(relations=json.dumps([
+                {"key": str(i), "source": source, "target": target, "descriptions": descs}
+                for i, ((source, target), descs) in enumerate(items)
+            ], ensure_ascii=False, indent=1))
+        response = await self._llm.session().single_turn(prompt)
+        try:
+            summaries = str2json(response)
+            assert isinstance(summaries, dict)
+        except Exception:
+            summaries = {}
+        
+        results = []
+        fallbacks = []
+        checkpointed = {}
+        for i, (names, descs) in enumerate(items):
+            summary = summaries.get(str(i))
+            if isinstance(summary, str) and summary.strip():
+                results.append(summary)
+                checkpointed[Checkpoint.key(kind, *names, descs)] = summary
+            else:
+                results.append(None)
+                fallbacks.append(i)
+        if self._checkpoint and checkpointed:
+            # One write for the whole batch, off the event loop
+            await asyncio.to_thread(self._checkpoint.set_summaries, checkpointed)
+        # Fall back to one request per item the response does not cover
+        for i, summary in zip(fallbacks, await asyncio.gather(
+            *(self._item_summary(kind, *items[i]) for i in fallbacks)
+        )):
+            results[i] = summary
+        return results
+    
+    def _summarize(self, kind: str, items: list[tuple[tuple[str, ...], list[str]]]) -> list[str]:
+        """Summarize the descriptions of entities (`kind` "entity", names are `(name,)`)
+        or relations (`kind` "relation", names are `(source, target)`).
+        
+        Small items are packed into batches of `summary_batch_size` items and at most
+        `summary_batch_tokens` tokens, every batch and every large item is sent concurrently.
+        """
+        results: list[str | None] = [None] * len(items)
+        batches: list[list[int]] = [[]]
+        singles: list[int] = []
+        num_tokens = 0
+        for i, (names, descs) in enumerate(items):
+            if len(descs) <= 1:
+                results[i] = descs[0] if descs else "None"
+                continue
+            if self._checkpoint:
+                results[i] = self._checkpoint.get_summary(Checkpoint.key(kind, *names, descs))
+                if results[i] is not None:
+                    continue
+            length = sum(len(self._encoding.encode(desc)) for desc in descs)
+            if self._summary_batch_size <= 1 or length > self._summary_batch_tokens // 2:
+                singles.append(i)
+                continue
+            if len(batches[-1]) >= self._summary_batch_size or num_tokens + length > self._summary_batch_tokens:
+                batches.append([])
+                num_tokens = 0
+            batches[-1].append(i)
+            num_tokens += length
+        batches = [batch for batch in batches if batch]
+        
+        summaries = run_many(
+            [self._batch_summary(kind, [items[i] for i in batch]) for batch in batches]
+            + [self._item_summary(kind, *items[i]) for i in singles]
+        )
+        for batch, batch_summaries in zip(batches, summaries):
+            for i, summary in zip(batch, batch_summaries):
+                results[i] = summary
+        for i, summary in zip(singles, summaries[len(batches):]):
+            results[i] = summary
+        return results
+    
+    def _embed(self, texts: list[str]) -> np.ndarray:
+        if not self._checkpoint:
+            return self._embedder.embed(texts)
+        # Keyed by model, a resume with another embedding model does not reuse vectors
+        model_name = self._embedder.model_name
+        vectors = self._checkpoint.get_embeddings(model_name, texts)
+        missing = [text for text in dict.fromkeys(texts) if text not in vectors]
+        if missing:
+            embeddings = self._embedder.embed(missing)
+            self._checkpoint.set_embeddings(model_name, dict(zip(missing, embeddings)))
+            vectors.update(zip(missing, embeddings))
+        return np.stack([vectors[text] for text in texts]) if texts else np.empty((0, 0), dtype=np.float32)
+    
     def _save(self, data: list[Any], output: str):
-        df = pd.DataFrame([record.__dict__ for record in data])
+        records = [dict(record.__dict__) for record in data]
+        # Embeddings are saved as one float32 matrix next to the parquet file, rows refer to it
+        embeddings = []
+        for record in records:
+            embedding = record.pop("embedding", None)
+            record["embedding_row"] = len(embeddings) if embedding is not None else -1
+            if embedding is not None:
+                embeddings.append(embedding)
+        save_embeddings(embeddings_path(output), embeddings)
+        if self._ann_index:
+            IVFIndex(np.asarray(embeddings, dtype=np.float32), n_lists=self._ann_lists).save(ivf_path(output))
+        elif os.path.exists(ivf_path(output)):
+            # An index left by an earlier build no longer matches the embeddings
+            os.remove(ivf_path(output))
+        df = pd.DataFrame(records)
         df.to_parquet(output, engine="pyarrow")
     
-    def run(self, doc_or_path: str, output: str, replace_pronoun: bool = False):
-        text_units = []
-        graph = nx.Graph()
-        # Step 1: Load document
-        text = self._load_doc(doc_or_path, replace_pronoun)
-        # Step 2: Split document into chunks
-        chunks = self._text_splitter.split_text(text)
-        
-        for chunk in chunks:
-            # Step 3: Extract KG from each chunk
-            g = self._extractor.run(chunk)
-            # Step 4: Connect chunk to KG
-            if self._connector:
-                text_units.extend(self._connector.connect(g, chunk))
-            # Step 5: Merge `g` to `graph`
-            self._merge(graph, g)
+    def _load(self, path: str, cls: type) -> list[Any]:
+        if not os.path.exists(path):
+            return []
+        return [cls.from_dict(record) for record in load_parquet(path)]
+    
+    def _build_entities(self, graph: GraphAccumulator, changed: set[str] | None, existing: list[Entity]) -> list[Entity]:
+        """Convert nodes to entities, only new nodes and nodes in `changed` are summarized and embedded.
+        
+        Nodes are streamed from `graph` in batches, `changed` is None when all nodes changed.
+        """
+        name2ent = {entity.name: entity for entity in existing}
+        next_id = max((int(entity.id) for entity in existing), default=-1) + 1
         
         entities: list[Entity] = []
+        for nodes in graph.iter_nodes(self._graph_batch_size):
+            todo = [
+                (node, data) for node, data in nodes
+                if changed is None or node in changed or node not in name2ent
+            ]
+            # Summary description for each entity, all requests of a batch are sent concurrently
+            description_list = self._summarize("entity", [((node,), data["description"]) for node, data in todo])
+            # Embedding, batch processing
+            embeddings = self._embed(description_list)
+            updates = {node: (description_list[i], embeddings[i]) for i, (node, _) in enumerate(todo)}
+            
+            for node, data in nodes:
+                entity = name2ent.get(node)
+                if entity is None:
+                    entity = Entity(id=str(next_id), name=node)
+                    next_id += 1
+                if node in updates:
+                    entity.description, entity.embedding = updates[node]
+                entity.type = data["type"]
+                # Overlapping chunks may refer to the same text unit
+                entity.text_units = list(dict.fromkeys(data["text_units"])) if data.get("text_units") is not None else None
+                entities.append(entity)
+        return entities
+    
+    def _build_relations(
+        self,
+        graph: GraphAccumulator,
+        changed: set[frozenset[str]] | None,
+        entities: list[Entity],
+        existing: list[Relation]) -> list[Relation]:
+        """Convert edges to relations, only new edges and edges in `changed` are summarized and embedded."""
+        ent2id = {entity.name: entity.id for entity in entities}
+        id2name = {entity.id: entity.name for entity in entities}
+        pair2rel = {
+            frozenset((id2name[rel.source], id2name[rel.target])): rel for rel in existing
+            if rel.source in id2name and rel.target in id2name
+        }
+        next_id = max((int(relation.id) for relation in existing), default=-1) + 1
+        
         relations: list[Relation] = []
+        for edges in graph.iter_edges(self._graph_batch_size):
+            todo = [
+                (source, target, data) for source, target, data in edges
+                if changed is None or frozenset((source, target)) in changed or frozenset((source, target)) not in pair2rel
+            ]
+            # Summary description for each relation
+            description_list = self._summarize("relation", [
+                ((source, target), data["relations"])
+                for source, target, data in todo
+            ])
+            # Embedding, batch processing
+            embeddings = self._embed(description_list)
+            updates = {
+                frozenset((source, target)): (description_list[i], embeddings[i])
+                for i, (source, target, _) in enumerate(todo)
+            }
+            
+            for source, target, _ in edges:
+                pair = frozenset((source, target))
+                relation = pair2rel.get(pair)
+                if relation is None:
+                    relation = Relation(id=str(next_id), source=ent2id[source], target=ent2id[target], description="")
+                    next_id += 1
+                if pair in updates:
+                    relation.description, relation.embedding = updates[pair]
+                relations.append(relation)
+        return relations
+    
+    def _split_doc(self, doc_or_path: str, replace_pronoun: bool) -> Iterator[str]:
+        # Step 1 & 2: Load document and split it into chunks, files are streamed unless their
+        # pronouns are replaced
+        if os.path.exists(doc_or_path) and not replace_pronoun:
+            pieces = (piece.replace("\n\n", "\n") for piece in iter_text(doc_or_path))
+            chunks = self._text_splitter.split_stream(pieces)
+        else:
+            chunks = iter(self._text_splitter.split_text(self._load_doc(doc_or_path, replace_pronoun)))
+        # Step 3: Parse chunks in one spaCy pass per model, shared by the extractors and the connector
+        for pipeline in SpacyPipeline.instances():
+            chunks = pipeline.stream(chunks)
+        yield from chunks
+    
+    def _read_ahead(self, chunks: Iterator[str], buffer: queue.Queue, stop: threading.Event):
+        """Move the chunks of a document into `buffer`, until done or `stop` is set."""
+        def put(item: tuple[str, Any]) -> bool:
+            while not stop.is_set():
+                try:
+                    buffer.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
         
-        # Summary description for each entity
-        description_list = [
-            self._ent_summary(node, data["description"])
-            for node, data in graph.nodes(data=True)
-        ]
-        # Embedding, batch processing
-        embeddings = get_embedding(description_list)
-        for i, (node, data) in enumerate(graph.nodes(data=True)):
-            entities.append(Entity(
-                id=str(len(entities)),
-                name=node,
-                type=data["type"],
-                description=description_list[i],
-                embedding=embeddings[i],
-                text_units=data.get("text_units"),
-            ))
+        try:
+            for chunk in chunks:
+                if not put(("chunk", chunk)):
+                    return
+        except BaseException as e:
+            put(("error", e))
+        else:
+            put(("end", None))
+    
+    def _drain(self, buffer: queue.Queue) -> Iterator[str]:
+        while True:
+            kind, item = buffer.get()
+            if kind == "end":
+                return
+            if kind == "error":
+                raise item
+            yield item
+    
+    def _prepare(self, documents: Iterable[tuple[str, str]], replace_pronoun: bool) -> Iterator[tuple[str, Iterator[str]]]:
+        """Load and split documents on the preparation pool, a few documents ahead of extraction.
         
-        # Summary description for each relation
-        description_list = [
-            self._rel_summary(source, target, data["relations"])
-            for source, target, data in graph.edges(data=True)
-        ]
-        # Embedding, batch processing
-        embeddings = get_embedding(description_list)
-        ent2id = {entity.name: entity.id for entity in entities}
-        for i, (source, target, data) in enumerate(graph.edges(data=True)):
-            relations.append(Relation(
-                id=str(len(relations)),
-                source=ent2id[source],
-                target=ent2id[target],
-                description=description_list[i],
-                embedding=embeddings[i]
-            ))
+        Chunks are yielded while their document is still being read, each document holds at most
+        `_prefetch_chunks` prepared chunks in memory.
+        """
+        stop = threading.Event()
+        with ThreadPoolExecutor(max_workers=self._prep_workers) as executor:
+            try:
+                pending: deque[tuple[str, queue.Queue]] = deque()
+                for doc_id, doc_or_path in documents:
+                    buffer = queue.Queue(maxsize=self._prefetch_chunks)
+                    executor.submit(self._read_ahead, self._split_doc(doc_or_path, replace_pronoun), buffer, stop)
+                    pending.append((doc_id, buffer))
+                    # Only a bounded number of documents is prepared ahead
+                    if len(pending) > self._prep_workers:
+                        doc_id, buffer = pending.popleft()
+                        yield doc_id, self._drain(buffer)
+                while pending:
+                    doc_id, buffer = pending.popleft()
+                    yield doc_id, self._drain(buffer)
+            finally:
+                # Unblock the documents still being prepared if extraction stops early
+                stop.set()
+    
+    def run(self,
+            doc_or_path: str,
+            output: str,
+            replace_pronoun: bool = False,
+            incremental: bool = False,
+            resume: bool = False):
+        """Build the index of a document into `output`.
+        
+        With `incremental`, the index already in `output` is extended: only chunks that have not
+        been indexed are extracted, and only entities and relations they touch are re-summarized.
+        Finished chunks, summaries and embeddings are checkpointed to `output` until the build
+        completes, with `resume` a failed build continues from its checkpoint.
+        """
+        if os.path.exists(doc_or_path):
+            doc_id = os.path.basename(doc_or_path)
+        else:
+            doc_id = hashlib.sha256(doc_or_path.encode()).hexdigest()[:16]
+        self._build([(doc_id, doc_or_path)], output, replace_pronoun, incremental, resume)
+    
+    def run_corpus(self,
+                   source: str,
+                   output: str,
+                   replace_pronoun: bool = False,
+                   incremental: bool = False,
+                   resume: bool = False):
+        """Build the index of a corpus, see `iter_documents` for the accepted sources.
+        
+        Documents are streamed, only the documents being prepared or extracted are held in memory.
+        """
+        self._build(iter_documents(source), output, replace_pronoun, incremental, resume)
+    
+    def _build(self,
+               documents: Iterable[tuple[str, str]],
+               output: str,
+               replace_pronoun: bool,
+               incremental: bool,
+               resume: bool):
+        checkpoint_path = os.path.join(output, "checkpoint.sqlite")
+        if not resume and os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
+        self._checkpoint = Checkpoint(checkpoint_path)
+        try:
+            self._run(documents, output, replace_pronoun, incremental)
+        except BaseException:
+            self._checkpoint = None
+            raise
+        # The build is complete, its results supersede the checkpoint
+        self._checkpoint.remove()
+        self._checkpoint = None
+    
+    def _run(self, documents: Iterable[tuple[str, str]], output: str, replace_pronoun: bool, incremental: bool):
+        text_units: dict[str, TextUnit] = {}
+        graph = graph_accumulators[self._graph_store](output)
+        chunk_ids: list[str] = []
+        existing_entities: list[Entity] = []
+        existing_relations: list[Relation] = []
+        if incremental:
+            if not graph.exists() and os.path.exists(os.path.join(output, "entities.parquet")):
+                # Without the unsummarized graph, existing entities and relations cannot be extended
+                raise FileNotFoundError(
+                    f"No {self._graph_store} graph state in {output}, which incremental builds extend. "
+                    "Rebuild the index without `incremental`, or with the `graph_store` it was built with."
+                )
+            chunk_ids = graph.load()
+            existing_entities = self._load(os.path.join(output, "entities.parquet"), Entity)
+            existing_relations = self._load(os.path.join(output, "relations.parquet"), Relation)
+            text_units = {
+                text_unit.id: text_unit
+                for text_unit in self._load(os.path.join(output, "text_units.parquet"), TextUnit)
+            }
+        
+        # Only tracked in incremental mode, otherwise every node and edge is new
+        changed_nodes: set[str] | None = set() if incremental else None
+        changed_edges: set[frozenset[str]] | None = set() if incremental else None
+        processed = set(chunk_ids)
+        # Text units of the chunks extracted in this run, and documents sharing a chunk not merged yet
+        chunk_units: dict[str, list[str]] = {}
+        shared_docs: dict[str, list[str]] = {}
+        
+        def add_document(text_unit_id: str, doc_id: str):
+            documents = text_units[text_unit_id].documents or []
+            if doc_id not in documents:
+                text_units[text_unit_id].documents = documents + [doc_id]
+        
+        def merge(doc_id: str, chunk_id: str, future: Future):
+            g, chunk_text_units = future.result()
+            # Identical text units, e.g. from the overlap of neighbouring chunks, are kept once
+            for text_unit in chunk_text_units:
+                if text_unit.id in text_units:
+                    add_document(text_unit.id, doc_id)
+                else:
+                    text_unit.documents = [doc_id]
+                    text_units[text_unit.id] = text_unit
+            chunk_units[chunk_id] = [text_unit.id for text_unit in chunk_text_units]
+            for shared_doc_id in shared_docs.pop(chunk_id, []):
+                for text_unit_id in chunk_units[chunk_id]:
+                    add_document(text_unit_id, shared_doc_id)
+            if incremental:
+                changed_nodes.update(g.nodes())
+                changed_edges.update(frozenset(edge) for edge in g.edges())
+            # Step 5: Merge `g` to `graph`
+            graph.merge(g)
+        
+        # Step 3 & 4: Chunks are processed by `max_workers` threads, each with its own conversation
+        with ThreadPoolExecutor(max_workers=self._max_workers) as executor:
+            # Merged in submission order, so the merged graph does not depend on scheduling
+            pending: deque[tuple[str, str, Future]] = deque()
+            for doc_id, chunks in self._prepare(documents, replace_pronoun):
+                for chunk in chunks:
+                    # Chunks indexed before are identified by content hash
+                    chunk_id = hashlib.sha256(chunk.encode()).hexdigest()
+                    if chunk_id in processed:
+                        # The chunk is extracted once, its text units also belong to this document
+                        if chunk_id in chunk_units:
+                            for text_unit_id in chunk_units[chunk_id]:
+                                add_document(text_unit_id, doc_id)
+                        else:
+                            shared_docs.setdefault(chunk_id, []).append(doc_id)
+                        continue
+                    processed.add(chunk_id)
+                    chunk_ids.append(chunk_id)
+                    pending.append((doc_id, chunk_id, executor.submit(self._process_chunk, chunk_id, chunk)))
+                    if len(pending) >= 2 * self._max_workers:
+                        merge(*pending.popleft())
+            while pending:
+                merge(*pending.popleft())
+        
+        # Text units are embedded in one pass, units loaded from an existing index are already embedded
+        pending_units = [text_unit for text_unit in text_units.values() if text_unit.embedding is None]
+        embeddings = self._embed([text_unit.content for text_unit in pending_units])
+        for text_unit, embedding in zip(pending_units, embeddings):
+            text_unit.embedding = embedding
+        
+        entities = self._build_entities(graph, changed_nodes, existing_entities)
+        relations = self._build_relations(graph, changed_edges, entities, existing_relations)
         
-        # Step 6: Align entities
+        # Step 6: Align entities, in incremental mode only new entities are aligned against the others
         if self._align_pipeline:
-            self._align_pipeline.run(entities)
+            names = {entity.name for entity in existing_entities}
+            new_entities = [entity for entity in entities if entity.name not in names]
+            if not incremental:
+                self._align_pipeline.run(entities)
+            elif new_entities:
+                self._align_pipeline.run(entities, targets=new_entities)
         # Step 7: Save result
         if not os.path.exists(output):
             os.makedirs(output)
         self._save(entities, os.path.join(output, "entities.parquet"))
         self._save(relations, os.path.join(output, "relations.parquet"))
-        self._save(text_units, os.path.join(output, "text_units.parquet"))
+        self._save(list(text_units.values()), os.path.join(output, "text_units.parquet"))
+        # Adjacency of the saved entities and relations, memory mapped at query time
+        AdjacencyGraph.from_ids(
+            [entity.id for entity in entities],
+            [relation.source for relation in relations],
+            [relation.target for relation in relations],
+        ).save(output)
+        graph.save(chunk_ids)
@@ -0,0 +1,101 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from typing import Any
+
+import networkx as nx
+import numpy as np
+
+from graphrag.model import TextUnit
+from graphrag.utils.embedding import EmbeddingCache
+
+
+class Checkpoint:
+    """Results of finished work units of a build, saved as soon as each unit completes.
+    
+    Chunks are keyed by their content hash, summaries and embeddings by the hash of their input,
+    so a resumed build only reuses results whose input did not change.
+    """
+    def __init__(self, path: str) -> None:
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        # Commits only wait for the write-ahead log, not for the database file
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS chunks (key TEXT PRIMARY KEY, data TEXT NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS summaries (key TEXT PRIMARY KEY, summary TEXT NOT NULL);"
+        )
+        self._conn.commit()
+        self._lock = threading.Lock()
+        # Embeddings share the file, in the format of the embedding cache
+        self._embeddings = EmbeddingCache(path)
+    
+    @staticmethod
+    def key(*values: Any) -> str:
+        return hashlib.sha256(json.dumps(values, ensure_ascii=False).encode()).hexdigest()
+    
+    def _get(self, sql: str, key: str) -> Any:
+        with self._lock:
+            row = self._conn.execute(sql, (key,)).fetchone()
+        return row[0] if row else None
+    
+    def _set(self, sql: str, params: list[tuple]):
+        with self._lock:
+            self._conn.executemany(sql, params)
+            self._conn.commit()
+    
+    def get_chunk(self, chunk_id: str) -> tuple[nx.Graph, list[TextUnit]] | None:
+        data = self._get("SELECT data FROM chunks WHERE key = ?", chunk_id)
+        if data is None:
+            return None
+        data = json.loads(data)
+        graph = nx.Graph()
+        graph.add_nodes_from((node, attrs) for node, attrs in data["nodes"])
+        graph.add_edges_from((source, target, attrs) for source, target, attrs in data["edges"])
+        return graph, [TextUnit.from_dict(text_unit) for text_unit in data["text_units"]]
+    
+    def set_chunk(self, chunk_id: str, graph: nx.Graph, text_units: list[TextUnit]):
+        data = {
+            "nodes": [[node, attrs] for node, attrs in graph.nodes(data=True)],
+            "edges": [[source, target, attrs] for source, target, attrs in graph.edges(data=True)],
+            "text_units": [
+                {**text_unit.__dict__, "embedding": np.asarray(text_unit.embedding).tolist()}
+                if text_unit.embedding is not None else text_unit.__dict__
+                for text_unit in text_units
+            ],
+        }
+        self._set("INSERT OR REPLACE INTO chunks (key, data) VALUES (?, ?)", [(chunk_id, json.dumps(data, ensure_ascii=False))])
+    
+    def get_summary(self, key: str) -> str | None:
+        return self._get("SELECT summary FROM summaries WHERE key = ?", key)
+    
+    def set_summary(self, key: str, summary: str):
+        self.set_summaries({key: summary})
+    
+    def set_summaries(self, summaries: dict[str, str]):
+        self._set("INSERT OR REPLACE INTO summaries (key, summary) VALUES (?, ?)", list(summaries.items()))
+    
+    def get_embeddings(self, model_name: str, texts: list[str]) -> dict[str, np.ndarray]:
+        """Embeddings of `texts` by `model_name` saved before, in one batched lookup."""
+        keys = {text: EmbeddingCache.key(model_name, text) for text in dict.fromkeys(texts)}
+        found = self._embeddings.get_many(list(keys.values()))
+        return {text: found[key] for text, key in keys.items() if key in found}
+    
+    def set_embeddings(self, model_name: str, vectors: dict[str, np.ndarray]):
+        self._embeddings.set_many({
+            EmbeddingCache.key(model_name, text): np.asarray(vector, dtype=np.float32)
+            for text, vector in vectors.items()
+        })
+    
+    def remove(self):
+        with self._lock:
+            self._conn.close()
+        self._embeddings.close()
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(self.path + suffix):
+                os.remove(self.path + suffix)
@@ -1,18 +1,16 @@
 import hashlib
-import re
-import uuid
 from abc import ABC, abstractmethod
 from collections import defaultdict
 
 import networkx as nx
 import tiktoken
 
-from graphrag.index.utils.nlp import SpacyModel
+from graphrag.index.utils.matcher import EntityMatcher
+from graphrag.index.utils.nlp import SpacyPipeline
 from graphrag.llm import LLM
 from graphrag.model.text_unit import TextUnit
 from graphrag.prompts.index.sentence_evaluation import \
     SENTENCE_EVALUATION_PROMPT
-from graphrag.utils.embedding import get_embedding
 from graphrag.utils.transform import str2json
 
 
@@ -29,17 +27,14 @@ class SentenceConnector(Connector):
                  encoding_model: str = "cl100k_base") -> None:
         self._llm = llm
         self._MAX_LENGTH = 256
-        self._nlp = SpacyModel.get_model(model_name)
+        # Only sentence boundaries are needed, the pass is shared with other consumers of the model
+        self._nlp = SpacyPipeline.shared(model_name)
+        self._nlp.require("sents")
         self._encoding_model = tiktoken.get_encoding(encoding_model)
     
     def _get_sents(self, text: str) -> list[str]:
         """Split the text into sentences."""
-        doc = self._nlp(text)
-        return [sent.text for sent in doc.sents]
-    
-    def _get_pattern(self, word: str) -> str:
-        """Generate regular expressions for word matching."""
-        return r"\s*\b" + re.escape(word) + r"\b\s*[!.,?;:']*"
+        return self._nlp.parse(text).sents
     
     def _sent_evaluate(self, sents: list[str]) -> list[int]:
         """Using LLM to evaluate the information content of sentences."""
@@ -64,6 +59,10 @@ class SentenceConnector(Connector):
         rep = f"{len(nums)}-" + "-".join(map(str, nums))
         return hashlib.sha256(rep.encode()).hexdigest()
     
+    def _get_text_unit_id(self, content: str) -> str:
+        """Text units are identified by their content, so identical units from overlapping chunks coincide."""
+        return hashlib.sha256(content.encode()).hexdigest()
+    
     def _merge_nums(self, nums: list[str]) -> list[list[str]]:
         """Merge consecutive numbers into a list"""
         pre = nums[0]
@@ -89,23 +88,24 @@ class SentenceConnector(Connector):
             scores = self._sent_evaluate(sents)
         
         sent2ents: list[list[str]] = [[] for _ in range(len(sents))]
-        ent2sents: dict[str, list[int]] = defaultdict(list)
+        mentions: dict[str, list[int]] = defaultdict(list)
         for entity in graph.nodes():
             graph.nodes[entity]["text_units"] = []
-            # Search for sentences with entities appearing
-            for sent_id, sent in enumerate(sents):
-                # Filter out sentences with score below the threshold
-                if threshold != -1 and scores and scores[sent_id] < threshold:
-                    continue
-                # Check whether the entity appears in the sentence
-                if ignore_case:
-                    find = re.search(self._get_pattern(entity.lower()), sent.lower())
-                else:
-                    find = re.search(self._get_pattern(entity), sent)
-                
-                if find:
-                    sent2ents[sent_id].append(entity)
-                    ent2sents[entity].append(sent_id)
+        # Search for sentences with entities appearing, all entities are matched in one pass per sentence
+        order = {entity: i for i, entity in enumerate(graph.nodes())}
+        matcher = EntityMatcher(graph.nodes(), ignore_case=ignore_case)
+        for sent_id, sent in enumerate(sents):
+            # Filter out sentences with score below the threshold
+            if threshold != -1 and scores and scores[sent_id] < threshold:
+                continue
+            sent2ents[sent_id] = sorted(matcher.find(sent), key=order.get)
+            for entity in sent2ents[sent_id]:
+                mentions[entity].append(sent_id)
+        # Keep entities in graph order
+        ent2sents: dict[str, list[int]] = defaultdict(list)
+        for entity in graph.nodes():
+            if entity in mentions:
+                ent2sents[entity] = mentions[entity]
         # Associate unrelated sentences with the nearest entities on both sides
         i = 0
         while i < len(sents):
@@ -146,9 +146,10 @@ class SentenceConnector(Connector):
                             hash_id = self._get_hash(final_sents_id)
                             # Duplicate removal
                             if hash_id not in text_units:
+                                content = " ".join(sents[id] for id in final_sents_id)
                                 text_units[hash_id] = TextUnit(
-                                    id=str(uuid.uuid1()),
-                                    content=" ".join(sents[id] for id in final_sents_id)
+                                    id=self._get_text_unit_id(content),
+                                    content=content
                                 )
                             graph.nodes[entity]["text_units"].append(text_units[hash_id].id)
                             length = length_ - length
@@ -156,9 +157,10 @@ class SentenceConnector(Connector):
                     # Post processing
                     hash_id = self._get_hash(final_sents_id)
                     if hash_id not in text_units:
+                        content = " ".join(sents[id] for id in final_sents_id)
                         text_units[hash_id] = TextUnit(
-                            id=str(uuid.uuid1()),
-                            content=" ".join(sents[id] for id in final_sents_id)
+                            id=self._get_text_unit_id(content),
+                            content=content
                         )
                     graph.nodes[entity]["text_units"].append(text_units[hash_id].id)
         else:
@@ -166,16 +168,12 @@ class SentenceConnector(Connector):
                 for sent_id in ref_sents:
                     if sent_id not in text_units:
                         text_units[sent_id] = TextUnit(
-                            id=str(uuid.uuid1()),
+                            id=self._get_text_unit_id(sents[sent_id]),
                             content=sents[sent_id]
                         )
                     graph.nodes[entity]["text_units"].append(text_units[sent_id].id)
-        text_units = [text_unit for _, text_unit in text_units.items()]
-        # Perform batch embedding
-        embeddings = get_embedding([text_unit.content for text_unit in text_units])
-        for i in range(len(text_units)):
-            text_units[i].embedding = embeddings[i]
-        return text_units
+        # Text units are embedded once for the whole build, see `Builder`
+        return [text_unit for _, text_unit in text_units.items()]
     
     def connect(self, graph, text):
         # Split text into sentences
@@ -1,5 +1,5 @@
 from .graph_extractor import GraphExtractor
-from .strategy import (LLMEntityExtractor, LLMRelationExtractor,
-                       NEREntityExtractor)
+from .strategy import (LLMEntityExtractor, LLMJointExtractor,
+                       LLMRelationExtractor, NEREntityExtractor)
 
-__all__ = ["LLMEntityExtractor", "LLMRelationExtractor", "NEREntityExtractor", "GraphExtractor"]
+__all__ = ["LLMEntityExtractor", "LLMJointExtractor", "LLMRelationExtractor", "NEREntityExtractor", "GraphExtractor"]
@@ -2,13 +2,17 @@ from typing import Any
 
 import networkx as nx
 
-from .strategy import EntityExtractor, RealtionExtractor
+from .strategy import EntityExtractor, JointExtractor, RealtionExtractor
 
 
 class GraphExtractor:
-    def __init__(self, ent_extractors: list[EntityExtractor], rel_extractors: list[RealtionExtractor]):
+    def __init__(self,
+                 ent_extractors: list[EntityExtractor],
+                 rel_extractors: list[RealtionExtractor],
+                 joint_extractors: list[JointExtractor] | None = None):
         self._ent_extractors = ent_extractors
         self._rel_extractors = rel_extractors
+        self._joint_extractors = joint_extractors or []
     
     def _process_results(self, entities: list[Any], relations: list[Any]) -> nx.Graph:
         graph = nx.Graph()
@@ -54,6 +58,12 @@ class GraphExtractor:
         entities = []
         relations = []
         
+        # Extract entities and relations together
+        for extractor in self._joint_extractors:
+            ents, rels = extractor(text)
+            entities.extend(ents)
+            relations.extend(rels)
+        
         # Extract entities
         for extractor in self._ent_extractors:
             entities.extend(extractor(text))
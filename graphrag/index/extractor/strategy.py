@@ -1,8 +1,8 @@
 from abc import ABC, abstractmethod
 from typing import Any
 
-from graphrag.index.utils.nlp import SpacyModel
-from graphrag.llm import LLM
+from graphrag.index.utils.nlp import SpacyPipeline
+from graphrag.llm import LLM, run_sync
 from graphrag.prompts.index.extraction import *
 from graphrag.utils.transform import str2json
 
@@ -13,20 +13,21 @@ class LLMExtractor:
         self._extraction_prompt = prompt
         self._max_gleanings = max_gleanings
     
-    def _llm_extract(self, extract_prompt: str, continue_prompt: str, loop_prompt: str) -> list[str]:
-        self._llm.reset()  # Just in case
+    async def _llm_extract(self, extract_prompt: str, continue_prompt: str, loop_prompt: str) -> list[str]:
+        # Each call owns its session, so chunks can be extracted concurrently
+        session = self._llm.session()
         
         results = []
-        response = self._llm.multi_turn(extract_prompt)
+        response = await session.multi_turn(extract_prompt)
         results.append(response)
         
         # ensure to extract as many information as possible
         for _ in range(self._max_gleanings - 1):
-            response = self._llm.multi_turn(continue_prompt)
+            response = await session.multi_turn(continue_prompt)
             results.append(response)
             
             # determine there further extraction is necessary
-            response = self._llm.multi_turn(loop_prompt)
+            response = await session.multi_turn(loop_prompt)
             if response != "YES":
                 break
         return results
@@ -58,11 +59,11 @@ class LLMEntityExtractor(EntityExtractor, LLMExtractor):
         LLMExtractor.__init__(self, llm, prompt or ENTITY_EXTRACTION_PROMPT, max_gleanings)
     
     def _extract(self, text: str) -> list[Any]:
-        results = self._llm_extract(
+        results = run_sync(self._llm_extract(
             extract_prompt=self._extraction_prompt.format(entity_types=self._entity_types, input_text=text),
             continue_prompt=CONTINUE_PROMPT.format(target="entities"),
             loop_prompt=LOOP_PROMPT.format(target="entities")
-        )
+        ))
         return self._process_results(results)
     
     def _process_results(self, results: list[str]) -> list[Any]:
@@ -77,14 +78,14 @@ class NEREntityExtractor(EntityExtractor, LLMExtractor):
     def __init__(self, llm: LLM, ner_model: str, entity_types: list[str] | None = None, prompt: str = None) -> None:
         EntityExtractor.__init__(self, entity_types)
         LLMExtractor.__init__(self, llm, prompt or DESC_EXTRACTION_PROMPT, 1)
-        self._nlp = SpacyModel.get_model(ner_model)
+        self._nlp = SpacyPipeline.shared(ner_model)
+        self._nlp.require("ents")
     
     def _extract(self, text: str) -> list[Any]:
-        doc = self._nlp(text)
         entities = []
-        for ent in doc.ents:
-            if ent.label_ in self._entity_types:
-                entity = {"name": ent.text, "type": ent.label_}
+        for ent_text, ent_label in self._nlp.parse(text).ents:
+            if ent_label in self._entity_types:
+                entity = {"name": ent_text, "type": ent_label}
                 # Ignore Duplicate
                 if entity not in entities:
                     entities.append(entity)
@@ -110,18 +111,77 @@ class LLMRelationExtractor(RealtionExtractor, LLMExtractor):
         super().__init__(llm, prompt or RELATION_EXTRACTION_PROMPT, max_gleanings)
     
     def _extract(self, text: str, entities: list[Any]) -> list[Any]:
-        results = self._llm_extract(
+        results = run_sync(self._llm_extract(
             extract_prompt=self._extraction_prompt.format(
                 input_text=text,
                 entities=[{"name": entity["name"], "type": entity["type"]} for entity in entities]
             ),
             continue_prompt=CONTINUE_PROMPT.format(target="relations"),
             loop_prompt=LOOP_PROMPT.format(target="relations"),
-        )
+        ))
         return self._process_results(results)
     
     def _process_results(self, results: list[str]) -> list[Any]:
         relations = []
         for result in results:
             relations.extend(str2json(result))
-        return relations
\ No newline at end of file
+        return relations
+
+
+class JointExtractor(ABC):
+    """Extract entities and relations together."""
+    def __init__(self, entity_types: list[str] | None = None) -> None:
+        self._entity_types = (
+            entity_types 
+            if entity_types 
+            else ["PERSON", "ORGANIZATION", "PRODUCT", "LOCATION", "EVENT"]
+        )
+    
+    @abstractmethod
+    def _extract(self, text: str) -> tuple[list[Any], list[Any]]:
+        pass
+    
+    def __call__(self, text: str) -> tuple[list[Any], list[Any]]:
+        return self._extract(text)
+
+
+class LLMJointExtractor(JointExtractor, LLMExtractor):
+    """Extract entities and relations of a chunk with one prompt.
+    
+    Each gleaning round is a single request, extraction stops once a round adds nothing, instead
+    of asking the LLM whether to continue.
+    """
+    def __init__(self,
+                 llm: LLM,
+                 entity_types: list[str] | None = None,
+                 prompt: str | None = None,
+                 max_gleanings: int = 1) -> None:
+        JointExtractor.__init__(self, entity_types)
+        LLMExtractor.__init__(self, llm, prompt or GRAPH_EXTRACTION_PROMPT, max_gleanings)
+    
+    async def _llm_extract_graph(self, text: str) -> tuple[list[Any], list[Any]]:
+        session = self._llm.session()
+        entities, relations = self._process_result(await session.multi_turn(
+            self._extraction_prompt.format(entity_types=self._entity_types, input_text=text)
+        ))
+        for _ in range(self._max_gleanings - 1):
+            new_entities, new_relations = self._process_result(await session.multi_turn(GRAPH_CONTINUE_PROMPT))
+            if not new_entities and not new_relations:
+                break
+            entities.extend(new_entities)
+            relations.extend(new_relations)
+        return entities, relations
+    
+    def _extract(self, text: str) -> tuple[list[Any], list[Any]]:
+        return run_sync(self._llm_extract_graph(text))
+    
+    def _process_result(self, result: str) -> tuple[list[Any], list[Any]]:
+        """Convert `str` to entities and relations"""
+        try:
+            result = str2json(result)
+        except:
+            # An empty or malformed answer adds nothing in this round
+            return [], []
+        if not isinstance(result, dict):
+            return [], []
+        return list(result.get("entities", [])), list(result.get("relations", []))
\ No newline at end of file
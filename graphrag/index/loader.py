@@ -0,0 +1,63 @@
+import glob
+import json
+import os
+import re
+from typing import Iterator
+
+# A line break followed by a non-whitespace character, cutting a text after it changes neither its
+# tokens nor the result of replacing "\n\n" in it
+_SAFE_CUT = re.compile(r"\n(?=\S)")
+
+
+def iter_documents(source: str, pattern: str = "**/*.txt") -> Iterator[tuple[str, str]]:
+    """Yield `(document id, path)` of every document in a corpus, without reading them.
+    
+    `source` is either a directory, searched with `pattern`, a glob pattern, or a manifest,
+    a `.jsonl` file with one `{"path": ..., "id": ...}` object per line (`id` is optional).
+    """
+    if os.path.isdir(source):
+        for path in sorted(glob.glob(os.path.join(source, pattern), recursive=True)):
+            if os.path.isfile(path):
+                yield os.path.relpath(path, source), path
+    elif source.endswith(".jsonl") and os.path.isfile(source):
+        root = os.path.dirname(source)
+        with open(source, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                path = os.path.join(root, record["path"])
+                yield record.get("id", record["path"]), path
+    else:
+        for path in sorted(glob.glob(source, recursive=True)):
+            if os.path.isfile(path):
+                yield path, path
+
+
+def iter_text(path: str, window_size: int = 1 << 20) -> Iterator[str]:
+    """Yield the content of a text file in consecutive pieces of about `window_size` characters.
+    
+    The file is read window by window. Pieces end after a line break, so tokenizing or normalizing
+    them one by one gives the same result as for the whole text. A piece only ends elsewhere, at a
+    space, if no line break was found within four windows.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        buffer = ""
+        while True:
+            window = f.read(window_size)
+            if not window:
+                break
+            buffer += window
+            match = None
+            for match in _SAFE_CUT.finditer(buffer, max(0, len(buffer) - len(window) - 1)):
+                pass
+            if match:
+                cut = match.end()
+            elif len(buffer) >= 4 * window_size and buffer.rfind(" ") > 0:
+                cut = buffer.rfind(" ")
+            else:
+                continue
+            yield buffer[:cut]
+            buffer = buffer[cut:]
+        if buffer:
+            yield buffer
@@ -0,0 +1,92 @@
+import hashlib
+import json
+import os
+import re
+import threading
+
+from graphrag.llm import LLM
+from graphrag.prompts.index.pronoun_replacement import PRONOUN_REPLACE_PROMPT
+
+# Whitespace after the end of a sentence, or around a line break
+_SENT_BOUNDARY = re.compile(r"(?<=[.!?。！？])\s+|\s*\n\s*")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def split_blocks(text: str, max_length: int) -> list[tuple[str, str]]:
+    """Split `text` into blocks of at most `max_length` characters, cut at sentence boundaries.
+    
+    Return `(block, separator)` pairs, the text is their concatenation. Blocks are cut at the last
+    sentence boundary that fits, otherwise at the last whitespace, and only cut inside a word if
+    there is none.
+    """
+    blocks = []
+    start = 0
+    while start < len(text):
+        end = start + max_length
+        if end >= len(text):
+            blocks.append((text[start:], ""))
+            break
+        cut = None
+        for pattern in (_SENT_BOUNDARY, _WHITESPACE):
+            for match in pattern.finditer(text, start, end):
+                if match.start() > start:
+                    cut = match
+            if cut:
+                break
+        if cut:
+            blocks.append((text[start:cut.start()], cut.group()))
+            start = cut.end()
+        else:
+            blocks.append((text[start:end], ""))
+            start = end
+    return blocks
+
+
+class PronounReplacer:
+    """Replace the personal pronouns of a text with the names they refer to.
+    
+    Blocks of the text are replaced concurrently. Results are cached in `cache_dir` by the hash
+    of the text, the prompt and the block size, so an edited text or prompt is never served
+    stale output.
+    """
+    def __init__(self, llm: LLM, cache_dir: str | None = None, max_length: int = 5000) -> None:
+        self._llm = llm
+        self._cache_dir = cache_dir
+        self._max_length = max_length
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+    
+    def _cache_path(self, text: str) -> str:
+        key = json.dumps([PRONOUN_REPLACE_PROMPT, self._max_length, text], ensure_ascii=False)
+        return os.path.join(self._cache_dir, f"{hashlib.sha256(key.encode()).hexdigest()}.txt")
+    
+    def _replace(self, text: str) -> tuple[str, bool]:
+        """Return the replaced text, and whether every block was replaced."""
+        blocks = split_blocks(text, self._max_length)
+        responses = self._llm.batch_single_turn([
+            PRONOUN_REPLACE_PROMPT.format(input_text=block) for block, _ in blocks
+        ])
+        # A failed call returns an empty response, its block is kept unchanged
+        complete = all(response or not block for response, (block, _) in zip(responses, blocks))
+        # Separators are kept verbatim, the LLM may strip whitespace around a block
+        return "".join(
+            (response or block) + separator for response, (block, separator) in zip(responses, blocks)
+        ), complete
+    
+    def __call__(self, text: str) -> str:
+        if not self._cache_dir:
+            return self._replace(text)[0]
+        path = self._cache_path(text)
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8", newline="") as f:
+                return f.read()
+        result, complete = self._replace(text)
+        if not complete:
+            # Not cached, a later run retries the failed blocks
+            return result
+        # Written under a temporary name, so an interrupted run leaves no partial result
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8", newline="") as f:
+            f.write(result)
+        os.replace(tmp_path, path)
+        return result
@@ -1,4 +1,5 @@
 from abc import ABC, abstractmethod
+from typing import Iterable, Iterator
 
 import tiktoken
 
@@ -7,6 +8,10 @@ class TextSplitter(ABC):
     @abstractmethod
     def split_text(self, text: str) -> list[str]:
         pass
+    
+    def split_stream(self, pieces: Iterable[str]) -> Iterator[str]:
+        """Split a text given as consecutive pieces, chunks are yielded as soon as they are complete."""
+        yield from self.split_text("".join(pieces))
 
 
 class TokenTextSplitter(TextSplitter):
@@ -20,9 +25,24 @@ class TokenTextSplitter(TextSplitter):
         return len(self._tokenizer.encode(text))
     
     def split_text(self, text: str) -> list[str]:
-        splits = []
-        input_ids = self._tokenizer.encode(text=text)
-        for i in range(0, len(input_ids), self._chunk_size - self._over_lap):
-            chunk_ids = input_ids[i:i+self._chunk_size]
-            splits.append(self._tokenizer.decode(chunk_ids))
-        return splits
\ No newline at end of file
+        return list(self.split_stream([text]))
+    
+    def split_stream(self, pieces: Iterable[str]) -> Iterator[str]:
+        """Tokenize the pieces one by one, only the tokens of the current piece are held in memory.
+        
+        The pieces must not cut a token, e.g. those of `iter_text`, chunks are then the same as
+        for the whole text.
+        """
+        step = self._chunk_size - self._over_lap
+        input_ids: list[int] = []
+        for piece in pieces:
+            input_ids.extend(self._tokenizer.encode(text=piece))
+            i = 0
+            while len(input_ids) - i >= self._chunk_size:
+                yield self._tokenizer.decode(input_ids[i:i+self._chunk_size])
+                i += step
+            # Tokens before the next chunk are no longer needed
+            del input_ids[:i]
+        # The last chunks, each starting `step` tokens after the previous one
+        for i in range(0, len(input_ids), step):
+            yield self._tokenizer.decode(input_ids[i:i+self._chunk_size])
@@ -0,0 +1,79 @@
+import re
+from collections import deque
+from typing import Iterable
+
+_WORD = re.compile(r"\w")
+
+
+def _is_boundary(text: str, pos: int) -> bool:
+    """Same as the regex `\\b` at `pos`."""
+    before = pos > 0 and _WORD.match(text[pos - 1]) is not None
+    after = pos < len(text) and _WORD.match(text[pos]) is not None
+    return before != after
+
+
+class EntityMatcher:
+    """Find all mentions of a set of entities in a single pass over a text.
+    
+    The entities are compiled into an Aho-Corasick automaton once, a mention only counts if it
+    starts and ends at word boundaries, the same as searching for `\\bentity\\b`. Overlapping
+    mentions (e.g. "New York" inside "New York City") are all reported.
+    """
+    def __init__(self, entities: Iterable[str], ignore_case: bool = True) -> None:
+        self._ignore_case = ignore_case
+        self._goto: list[dict[str, int]] = [{}]
+        self._fail: list[int] = [0]
+        self._out: list[list[str]] = [[]]
+        # Entities sharing the same key, e.g. "Apple" and "apple" when ignoring case
+        self._names: dict[str, list[str]] = {}
+        for entity in entities:
+            key = entity.lower() if ignore_case else entity
+            if not key:
+                continue
+            if key not in self._names:
+                self._names[key] = []
+                self._add(key)
+            self._names[key].append(entity)
+        self._build()
+    
+    def _add(self, key: str):
+        node = 0
+        for ch in key:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+                self._goto[node][ch] = nxt
+            node = nxt
+        self._out[node].append(key)
+    
+    def _build(self):
+        # Breadth-first, so the failure link of a node's parent is always ready
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self._goto[node].items():
+                queue.append(nxt)
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(ch, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+    
+    def find(self, text: str) -> list[str]:
+        """Return the entities mentioned in `text`."""
+        if self._ignore_case:
+            text = text.lower()
+        goto, fail, out = self._goto, self._fail, self._out
+        found: dict[str, None] = {}
+        node = 0
+        for end, ch in enumerate(text, 1):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            for key in out[node]:
+                if key not in found and _is_boundary(text, end - len(key)) and _is_boundary(text, end):
+                    found[key] = None
+        return [name for key in found for name in self._names[key]]
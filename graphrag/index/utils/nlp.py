@@ -1,3 +1,8 @@
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Iterable, Iterator
+
 import spacy
 
 
@@ -16,4 +21,130 @@ class SpacyModel:
                 download(model_name)
                 nlp = spacy.load(model_name)
             cls._models[model_name] = nlp
-        return cls._models[model_name]
\ No newline at end of file
+        return cls._models[model_name]
+
+
+@dataclass
+class ParsedText:
+    """What the consumers of a spaCy pass need from a `Doc`, much smaller than the `Doc` itself."""
+    sents: list[str] = field(default_factory=list)
+    # (text, label) of each named entity
+    ents: list[tuple[str, str]] = field(default_factory=list)
+
+
+class SpacyPipeline:
+    """A single spaCy pass per text, shared by every consumer of the same model.
+    
+    Consumers declare the features they read with `require`, components no consumer needs are
+    disabled. `stream` parses a stream of texts ahead of time in one long-lived `nlp.pipe` pass,
+    `parse` returns the cached result.
+    """
+    # Components each feature depends on
+    _FEATURES = {
+        "sents": ("tok2vec", "parser", "senter", "sentencizer"),
+        "ents": ("tok2vec", "ner", "entity_ruler"),
+    }
+    _pipelines: dict[str, "SpacyPipeline"] = {}
+    _options = {"n_process": 1, "batch_size": 64, "cache_size": 4096}
+    _lock = threading.Lock()
+    
+    def __init__(self, model_name: str, n_process: int = 1, batch_size: int = 64, cache_size: int = 4096) -> None:
+        self._nlp = SpacyModel.get_model(model_name)
+        self._n_process = n_process
+        self._batch_size = batch_size
+        self._cache_size = cache_size
+        self._features: set[str] = set()
+        self._cache: OrderedDict[str, ParsedText] = OrderedDict()
+        # Cache reads and writes are short, parsing holds its own lock so cache hits never wait for it
+        self._cache_lock = threading.Lock()
+        self._pipe_lock = threading.Lock()
+    
+    @classmethod
+    def configure(cls, **options):
+        """Set the options of pipelines created afterwards."""
+        cls._options = {**cls._options, **options}
+    
+    @classmethod
+    def shared(cls, model_name: str) -> "SpacyPipeline":
+        """Return the process-wide pipeline of `model_name`."""
+        with cls._lock:
+            if model_name not in cls._pipelines:
+                cls._pipelines[model_name] = cls(model_name, **cls._options)
+            return cls._pipelines[model_name]
+    
+    @classmethod
+    def instances(cls) -> list["SpacyPipeline"]:
+        with cls._lock:
+            return list(cls._pipelines.values())
+    
+    def require(self, *features: str):
+        for feature in features:
+            if feature not in self._FEATURES:
+                raise ValueError(f"Unknown feature: {feature}")
+        self._features.update(features)
+    
+    def _disabled(self) -> list[str]:
+        needed = {component for feature in self._features for component in self._FEATURES[feature]}
+        return [name for name in self._nlp.pipe_names if name not in needed]
+    
+    def _compact(self, doc) -> ParsedText:
+        return ParsedText(
+            sents=[sent.text for sent in doc.sents] if "sents" in self._features else [],
+            ents=[(ent.text, ent.label_) for ent in doc.ents] if "ents" in self._features else [],
+        )
+    
+    def _store(self, text: str, result: ParsedText):
+        with self._cache_lock:
+            self._cache[text] = result
+            self._cache.move_to_end(text)
+            if len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+    
+    def stream(self, texts: Iterable[str]) -> Iterator[str]:
+        """Parse `texts` in a single `nlp.pipe` pass, yield each text once its result is cached.
+        
+        spaCy batches the whole stream by `batch_size`, with `n_process` > 1 one pool of worker
+        processes parses it, started once for the stream.
+        """
+        docs = self._nlp.pipe(
+            ((text, text) for text in texts),
+            as_tuples=True,
+            disable=self._disabled(),
+            batch_size=self._batch_size,
+            n_process=self._n_process,
+        )
+        while True:
+            # Streams of concurrent documents share the model, one of them advances at a time
+            with self._pipe_lock:
+                item = next(docs, None)
+            if item is None:
+                return
+            doc, text = item
+            self._store(text, self._compact(doc))
+            yield text
+    
+    def pipe(self, texts: list[str]) -> dict[str, ParsedText]:
+        """Parse the texts not cached yet in one batched pass."""
+        with self._cache_lock:
+            parsed = {text: self._cache[text] for text in dict.fromkeys(texts) if text in self._cache}
+        missing = [text for text in dict.fromkeys(texts) if text not in parsed]
+        if not missing:
+            return parsed
+        with self._pipe_lock:
+            # Parsed outside of the cache lock, the generator runs the whole batch
+            results = [
+                self._compact(doc)
+                for doc in self._nlp.pipe(missing, disable=self._disabled(), batch_size=self._batch_size)
+            ]
+        for text, result in zip(missing, results):
+            parsed[text] = result
+            self._store(text, result)
+        return parsed
+    
+    def parse(self, text: str) -> ParsedText:
+        with self._cache_lock:
+            if text in self._cache:
+                self._cache.move_to_end(text)
+                return self._cache[text]
+        # Not prepared ahead, e.g. when used outside of `Builder`
+        return self.pipe([text])[text]
@@ -0,0 +1,31 @@
+class UnionFind:
+    """Disjoint sets over `0..n-1`, with path halving and union by size."""
+    def __init__(self, n: int) -> None:
+        self._parent = list(range(n))
+        self._size = [1] * n
+    
+    def find(self, x: int) -> int:
+        parent = self._parent
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+    
+    def union(self, a: int, b: int) -> bool:
+        """Merge the sets of `a` and `b`, return whether they were different sets."""
+        a, b = self.find(a), self.find(b)
+        if a == b:
+            return False
+        if self._size[a] < self._size[b]:
+            a, b = b, a
+        self._parent[b] = a
+        self._size[a] += self._size[b]
+        return True
+    
+    def groups(self, min_size: int = 1) -> list[list[int]]:
+        """Return the sets with at least `min_size` members, in order of their smallest member."""
+        groups: dict[int, list[int]] = {}
+        for x in range(len(self._parent)):
+            if self._size[self.find(x)] >= min_size:
+                groups.setdefault(self.find(x), []).append(x)
+        return list(groups.values())
@@ -1,2 +1,4 @@
-from .base_model import LLM
+from .base_model import LLM, Session, run_many, run_sync
+from .cache import ResponseCache
 from .gpt import OpenAIModel
+from .scheduler import Priority, RequestScheduler
@@ -1,22 +1,132 @@
+import asyncio
+import threading
 from abc import ABC, abstractmethod
+from typing import Any, Coroutine, Iterable
+
+from .cache import ResponseCache
+from .scheduler import Priority
+
+
+class _LoopThread:
+    """Event loop running in a daemon thread, shared by every LLM of the process."""
+    _loop: asyncio.AbstractEventLoop | None = None
+    _lock = threading.Lock()
+    
+    @classmethod
+    def get_loop(cls) -> asyncio.AbstractEventLoop:
+        with cls._lock:
+            if cls._loop is None:
+                cls._loop = asyncio.new_event_loop()
+                threading.Thread(target=cls._loop.run_forever, name="graphrag-llm", daemon=True).start()
+        return cls._loop
+
+
+def run_sync(coro: Coroutine[Any, Any, Any]) -> Any:
+    """Run a coroutine on the shared LLM event loop and block until it finishes.
+    
+    Safe to call from any thread, including worker threads of `Builder`, except the loop thread itself.
+    """
+    loop = _LoopThread.get_loop()
+    if threading.current_thread().name == "graphrag-llm":
+        raise RuntimeError("run_sync() cannot be called from the LLM event loop, await the coroutine instead.")
+    return asyncio.run_coroutine_threadsafe(coro, loop).result()
+
+
+def run_many(coros: Iterable[Coroutine[Any, Any, Any]]) -> list[Any]:
+    """Run coroutines concurrently on the shared LLM event loop, results keep the input order."""
+    async def gather():
+        return await asyncio.gather(*coros)
+    return run_sync(gather())
+
+
+class Session:
+    """A conversation with an `LLM`.
+    
+    Sessions only hold the message list, all sessions of an LLM share its client,
+    so any number of them can run concurrently.
+    """
+    def __init__(self, llm: "LLM", priority: int | None = None) -> None:
+        self._llm = llm
+        self.priority = llm.priority if priority is None else priority
+        self.reset()
+    
+    async def single_turn(self, input: str) -> str:
+        """Answer `input` without reading or recording the conversation history."""
+        return await self._llm.agenerate(
+            self._llm.new_conversation() + [{"role": "user", "content": input}],
+            self.priority,
+        )
+    
+    async def multi_turn(self, input: str) -> str:
+        """Answer `input` as the next turn of the conversation."""
+        messages = self.messages + [{"role": "user", "content": input}]
+        response = await self._llm.agenerate(messages, self.priority)
+        messages.append({"role": "assistant", "content": response})
+        self.messages = messages
+        return response
+    
+    def reset(self):
+        self.messages = self._llm.new_conversation()
 
 
 class LLM(ABC):
-    def __init__(self):
-        self.messages = []
+    def __init__(self, priority: int = Priority.NORMAL, cache: ResponseCache | None = None):
+        self.priority = priority
+        self.cache = cache
+        self._session: Session | None = None
     
     @abstractmethod
-    def _generate(self, input: str, messages: list[dict[str, str]] = None) -> str:
+    async def _agenerate(self, messages: list[dict[str, str]], priority: int = Priority.NORMAL) -> str:
+        """Return the reply to `messages`, whose last item is the user input."""
         pass
     
+    def _cache_params(self) -> dict[str, Any]:
+        """Generation parameters that, together with the messages, determine the response."""
+        return {"llm": type(self).__name__}
+    
+    async def agenerate(self, messages: list[dict[str, str]], priority: int = Priority.NORMAL) -> str:
+        """Return the reply to `messages`, replayed from `cache` if the same request was answered before."""
+        if self.cache is None:
+            return await self._agenerate(messages, priority)
+        key = ResponseCache.key(self._cache_params(), messages)
+        # Cache I/O runs in a worker thread, the event loop keeps serving other requests
+        response = await asyncio.to_thread(self.cache.get, key)
+        if response is None:
+            response = await self._agenerate(messages, priority)
+            # Failed calls return an empty response and are not worth keeping
+            if response:
+                await asyncio.to_thread(self.cache.set, key, response)
+        return response
+    
     @abstractmethod
-    def single_turn(self, input: str) -> str:
+    def new_conversation(self) -> list[dict[str, str]]:
+        """Return the messages a new conversation starts with."""
         pass
     
-    @abstractmethod
+    def session(self, priority: int | None = None) -> Session:
+        """Start a conversation, `priority` overrides the priority of the model."""
+        return Session(self, priority)
+    
+    @property
+    def messages(self) -> list[dict[str, str]]:
+        return self._default_session.messages
+    
+    @property
+    def _default_session(self) -> Session:
+        if self._session is None:
+            self._session = self.session()
+        return self._session
+    
+    def single_turn(self, input: str) -> str:
+        return run_sync(self._default_session.single_turn(input))
+    
+    def batch_single_turn(self, inputs: list[str]) -> list[str]:
+        """Answer every input concurrently, results keep the order of `inputs`."""
+        return run_many(self._default_session.single_turn(input) for input in inputs)
+    
     def multi_turn(self, input: str) -> str:
-        pass
+        """Continue the default conversation, use `session()` for concurrent conversations."""
+        return run_sync(self._default_session.multi_turn(input))
     
-    @abstractmethod
     def reset(self):
-        pass
\ No newline at end of file
+        self._default_session.reset()
\ No newline at end of file
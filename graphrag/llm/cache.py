@@ -0,0 +1,99 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any
+
+
+class ResponseCache:
+    """Content-addressed LLM responses stored in SQLite.
+    
+    A response is keyed by the hash of the generation parameters (model, temperature, ...)
+    and the full message list. When the stored responses exceed `max_size` bytes,
+    the least recently used ones are evicted. Access times of hits are written in batches instead
+    of one commit per hit.
+    """
+    def __init__(self, path: str, max_size: int = 1 << 30) -> None:
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        # Commits only wait for the write-ahead log, not for the database file
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, response TEXT NOT NULL, size INTEGER NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+        self._conn.commit()
+        self._lock = threading.Lock()
+        self._max_size = max_size
+        self._size = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        # Access times of hits not written yet
+        self._accessed: dict[str, float] = {}
+        self.hits = 0
+        self.misses = 0
+    
+    @staticmethod
+    def key(params: dict[str, Any], messages: list[dict[str, str]]) -> str:
+        rep = json.dumps({"params": params, "messages": messages}, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(rep.encode()).hexdigest()
+    
+    def get(self, key: str) -> str | None:
+        with self._lock:
+            row = self._conn.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._accessed[key] = time.time()
+            if len(self._accessed) >= 256:
+                self._flush_accessed()
+                self._conn.commit()
+            return row[0]
+    
+    def _flush_accessed(self):
+        self._conn.executemany(
+            "UPDATE responses SET accessed = ? WHERE key = ?",
+            [(accessed, key) for key, accessed in self._accessed.items()],
+        )
+        self._accessed.clear()
+    
+    def set(self, key: str, response: str):
+        size = len(response.encode())
+        with self._lock:
+            old = self._conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self._size += size - (old[0] if old else 0)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, response, size, accessed) VALUES (?, ?, ?, ?)",
+                (key, response, size, time.time()),
+            )
+            # Eviction sees the recent hits
+            self._flush_accessed()
+            self._evict()
+            self._conn.commit()
+    
+    def _evict(self):
+        # Drop least recently used responses until the cache fits into `max_size`
+        while self._size > self._max_size:
+            rows = self._conn.execute(
+                "SELECT key, size FROM responses ORDER BY accessed LIMIT 64"
+            ).fetchall()
+            if not rows:
+                break
+            for key, size in rows:
+                if self._size <= self._max_size:
+                    break
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._size -= size
+    
+    def stats(self) -> dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "size": self._size}
+    
+    def close(self):
+        with self._lock:
+            self._flush_accessed()
+            self._conn.commit()
+            self._conn.close()
@@ -1,48 +1,91 @@
+import asyncio
 import logging
 import os
-import time
+from typing import Any
 
-from openai import OpenAI
+import httpx
+import openai
+import tiktoken
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
 
 from .base_model import LLM
+from .cache import ResponseCache
+from .scheduler import Priority, RequestScheduler
 
 
 class OpenAIModel(LLM):
     def __init__(self,
                  model: str = "gpt-4o-mini",
                  max_trials: int = 5,
-                 failure_sleep_time: int = 3):
-        super().__init__()
-        self.client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
+                 failure_sleep_time: float = 1,
+                 max_connections: int = 100,
+                 requests_per_minute: float = 500,
+                 tokens_per_minute: float = 200_000,
+                 priority: int = Priority.NORMAL,
+                 cache: ResponseCache | None = None,
+                 temperature: float = 0.1):
+        super().__init__(priority, cache)
+        api_key = os.environ.get("OPENAI_API_KEY")
+        # One pooled client serves every session of this model, retries are left to the scheduler
+        self.client = AsyncOpenAI(
+            api_key=api_key,
+            max_retries=0,
+            http_client=DefaultAsyncHttpxClient(limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+            )),
+        )
         self.model = model
+        self.temperature = temperature
         self.max_trials = max_trials
-        self.failure_sleep_time = failure_sleep_time
+        # Models sharing an API key and model name share the request and token budget
+        self.scheduler = RequestScheduler.shared(
+            f"{api_key}:{model}",
+            requests_per_minute=requests_per_minute,
+            tokens_per_minute=tokens_per_minute,
+            max_concurrency=max_connections,
+            base_delay=failure_sleep_time,
+        )
+        try:
+            self._encoding = tiktoken.encoding_for_model(model)
+        except KeyError:
+            self._encoding = tiktoken.get_encoding("cl100k_base")
         self._sys_prompt = {"role": "system", "content": "You are a helpful assistant."}
-        self.reset()
     
-    def _generate(self, input: str, messages: list[dict[str, str]] = None) -> str:
-        for _ in range(self.max_trials):
+    def _cache_params(self) -> dict[str, Any]:
+        return {"model": self.model, "temperature": self.temperature}
+    
+    def _estimate_tokens(self, messages: list[dict[str, str]]) -> int:
+        # Prompt tokens plus a rough allowance for the completion
+        return sum(len(self._encoding.encode(message["content"])) + 4 for message in messages) + 256
+    
+    async def _agenerate(self, messages: list[dict[str, str]], priority: int = Priority.NORMAL) -> str:
+        estimated = self._estimate_tokens(messages)
+        for trial in range(self.max_trials):
+            await self.scheduler.acquire(estimated, priority)
             try:
-                messages.append({"role": "user", "content": input})
-                response = self.client.chat.completions.create(
+                raw = await self.client.chat.completions.with_raw_response.create(
                     model=self.model,
                     messages=messages,
-                    temperature=0.1,
+                    temperature=self.temperature,
                 )
-                response = response.choices[0].message.content
-                return response
-            except Exception as e:
-                logging.error("OpenAI API call failed due to %s. Retrying %d / %d times...", e, _+1, self.max_trials)
-                time.sleep(self.failure_sleep_time)
+            except (openai.RateLimitError, openai.InternalServerError, openai.APIConnectionError) as e:
+                self.scheduler.release()
+                headers = e.response.headers if isinstance(e, openai.APIStatusError) else None
+                delay = self.scheduler.backoff(trial, headers)
+                logging.error("OpenAI API call failed due to %s. Retrying %d / %d times in %.1fs...", e, trial+1, self.max_trials, delay)
+                await asyncio.sleep(delay)
+                continue
+            except openai.APIError as e:
+                # Invalid requests fail the same way on every retry
+                self.scheduler.release()
+                logging.error("OpenAI API call failed due to %s.", e)
+                return ""
+            self.scheduler.update(raw.headers)
+            response = raw.parse()
+            self.scheduler.release(estimated, response.usage.total_tokens if response.usage else None)
+            return response.choices[0].message.content
         return ""
     
-    def single_turn(self, input: str) -> str:
-        return self._generate(input, messages=[self._sys_prompt])
-    
-    def multi_turn(self, input: str) -> str:
-        response = self._generate(input, messages=self.messages)
-        self.messages.append({"role": "assistant", "content": response})
-        return response
-    
-    def reset(self):
-        self.messages = [self._sys_prompt]
\ No newline at end of file
+    def new_conversation(self) -> list[dict[str, str]]:
+        return [self._sys_prompt]
\ No newline at end of file
@@ -0,0 +1,162 @@
+import asyncio
+import heapq
+import itertools
+import random
+import re
+import threading
+import time
+from enum import IntEnum
+from typing import Mapping
+
+
+class Priority(IntEnum):
+    """Smaller value is served first."""
+    INTERACTIVE = 0
+    NORMAL = 1
+    BULK = 2
+
+
+class TokenBucket:
+    def __init__(self, capacity: float, per_minute: float) -> None:
+        self.capacity = capacity
+        self.tokens = capacity
+        self._rate = per_minute / 60
+        self._updated = time.monotonic()
+    
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self._rate)
+        self._updated = now
+    
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` can be consumed."""
+        self._refill()
+        # Requests larger than the bucket would wait forever, let them go once the bucket is full
+        amount = min(amount, self.capacity)
+        return max(0.0, (amount - self.tokens) / self._rate)
+    
+    def consume(self, amount: float):
+        self._refill()
+        self.tokens -= amount
+    
+    def limit(self, remaining: float):
+        """Align the bucket with the remaining budget reported by the server."""
+        self._refill()
+        self.tokens = min(self.tokens, remaining)
+
+
+def _parse_duration(value: str | None) -> float | None:
+    """Parse durations like `1s`, `6m0s` or `120ms` used by rate-limit headers."""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    units = {"h": 3600, "m": 60, "s": 1, "ms": 0.001}
+    parts = re.findall(r"([\d.]+)(ms|h|m|s)", value)
+    if not parts:
+        return None
+    return sum(float(num) * units[unit] for num, unit in parts)
+
+
+class RequestScheduler:
+    """Admission control for requests that share one API key.
+    
+    Requests wait in a priority queue until both the request and the token bucket allow
+    them and fewer than `max_concurrency` requests are in flight. Rate-limit headers
+    shrink the buckets, `retry-after` pauses the whole queue. Must be used from one event loop.
+    """
+    _schedulers: dict[str, "RequestScheduler"] = {}
+    _lock = threading.Lock()
+    
+    def __init__(self,
+                 requests_per_minute: float = 500,
+                 tokens_per_minute: float = 200_000,
+                 max_concurrency: int = 64,
+                 base_delay: float = 1,
+                 max_delay: float = 60) -> None:
+        self._requests = TokenBucket(requests_per_minute, requests_per_minute)
+        self._tokens = TokenBucket(tokens_per_minute, tokens_per_minute)
+        self._max_concurrency = max_concurrency
+        self._base_delay = base_delay
+        self._max_delay = max_delay
+        self._in_flight = 0
+        self._paused_until = 0.0
+        self._waiters: list[tuple[int, int, float, asyncio.Future]] = []
+        self._counter = itertools.count()
+        self._dispatcher: asyncio.Task | None = None
+        self._released: asyncio.Event | None = None
+    
+    @classmethod
+    def shared(cls, key: str, **limits) -> "RequestScheduler":
+        """Return the process-wide scheduler of `key`, limits only apply on first creation."""
+        with cls._lock:
+            if key not in cls._schedulers:
+                cls._schedulers[key] = cls(**limits)
+            return cls._schedulers[key]
+    
+    async def acquire(self, tokens: float, priority: int = Priority.NORMAL):
+        """Wait for a slot, every successful `acquire` must be paired with `release`."""
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._counter), tokens, future))
+        if self._dispatcher is None or self._dispatcher.done():
+            self._released = asyncio.Event()
+            self._dispatcher = asyncio.create_task(self._dispatch())
+        await future
+    
+    def release(self, estimated: float = 0, used: float | None = None):
+        """Free the slot and charge the difference between used and estimated tokens."""
+        self._in_flight -= 1
+        if used is not None:
+            self._tokens.consume(used - estimated)
+        self._released.set()
+    
+    async def _dispatch(self):
+        while self._waiters:
+            if self._in_flight >= self._max_concurrency:
+                self._released.clear()
+                await self._released.wait()
+                continue
+            priority, _, tokens, future = self._waiters[0]
+            if future.cancelled():
+                heapq.heappop(self._waiters)
+                continue
+            wait = max(
+                self._paused_until - time.monotonic(),
+                self._requests.wait_time(1),
+                self._tokens.wait_time(tokens),
+            )
+            if wait > 0:
+                # Sleep in short steps so that a new request with higher priority takes the head
+                await asyncio.sleep(min(wait, 0.5))
+                continue
+            heapq.heappop(self._waiters)
+            self._requests.consume(1)
+            self._tokens.consume(tokens)
+            self._in_flight += 1
+            future.set_result(None)
+    
+    def update(self, headers: Mapping[str, str]):
+        """Read rate-limit signals from response headers."""
+        now = time.monotonic()
+        for bucket, kind in ((self._requests, "requests"), (self._tokens, "tokens")):
+            remaining = headers.get(f"x-ratelimit-remaining-{kind}")
+            if remaining is None:
+                continue
+            bucket.limit(float(remaining))
+            reset = _parse_duration(headers.get(f"x-ratelimit-reset-{kind}"))
+            if float(remaining) <= 0 and reset:
+                self._paused_until = max(self._paused_until, now + reset)
+    
+    def backoff(self, attempt: int, headers: Mapping[str, str] | None = None) -> float:
+        """Return the delay before retry `attempt`, the queue is paused for the server's `retry-after`."""
+        # Exponential backoff with full jitter
+        delay = random.uniform(0, min(self._max_delay, self._base_delay * 2 ** attempt))
+        if headers:
+            retry_after = headers.get("retry-after-ms")
+            retry_after = float(retry_after) / 1000 if retry_after else _parse_duration(headers.get("retry-after"))
+            if retry_after:
+                self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+                delay = max(delay, retry_after)
+        return delay
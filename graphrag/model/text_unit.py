@@ -7,6 +7,7 @@ class TextUnit:
     id: str
     content: str
     embedding: list[float] | None = None
+    documents: list[str] | None = None
 
     @classmethod
     def from_dict(
@@ -15,9 +16,11 @@ class TextUnit:
         id_key: str = "id",
         content_key: str = "content",
         embedding_key: str = "embedding",
+        documents_key: str = "documents",
     ) -> "TextUnit":
         return TextUnit(
             id=d[id_key],
             content=d[content_key],
             embedding=d.get(embedding_key),
+            documents=d.get(documents_key),
         )
\ No newline at end of file
@@ -79,6 +79,54 @@ text:
 output:
 """
 
+GRAPH_EXTRACTION_PROMPT = """Given a text document and a list of entity types, identify all entities of those types from the text and all relations among them.
+
+-Steps-
+1. Identify all entities. For each identified entity, extract the following information:
+- entity_name: Name of the entity in text
+- entity_type: One of the following types: {entity_types}
+- entity_description: Comprehensive description of the entity
+
+2. From the entities identified in step 1, identify all pairs of (source_entity, target_entity) that are **related** to each other.
+For each pair of related entities, extract the following information:
+- source: name of an entity identified in step 1
+- target: name of an entity identified in step 1
+- relation_description: description of the relation between source entity and target entity
+
+3. Output in JSON format without annotations:
+{{
+    "entities": [
+        {{
+            "name": <entity_name>,
+            "type": <entity_type>,
+            "description": <entity_description>
+        }},
+        ...
+    ],
+    "relations": [
+        {{
+            "source": <source_entity>,
+            "target": <target_entity>,
+            "description": <relation_description>
+        }},
+        ...
+    ]
+}}
+
+-Real Data-
+entity_types:
+{entity_types}
+
+text:
+{input_text}
+
+output:
+"""
+
+GRAPH_CONTINUE_PROMPT = """MANY entities and relations were missed in the last extraction. Please add the missing entities and relations using the same format, with empty lists if there are none.
+Output:
+"""
+
 CONTINUE_PROMPT = """MANY {target} were missed in the last extraction. Please add the missing entities using the same format.
 Output:
 """
@@ -21,4 +21,28 @@ Description:
 {descriptions}
 
 Output:
-"""
\ No newline at end of file
+"""
+
+ENTITY_BATCH_SUMMARY_PROMPT = """Given a list of entities, each with a key and its descriptive sentences, generate a concise summary for every entity that highlights its core features clearly.
+**Note**: Summarize each entity only from its own descriptions.
+
+Return in JSON format only, mapping every key to the summary of its entity, as follows:
+{{"<key>": "<summary>", ...}}
+
+Entities:
+{entities}
+
+Output:
+"""
+
+RELATION_BATCH_SUMMARY_PROMPT = """Given a list of entity pairs, each with a key and the descriptive sentences of the relation between the source and target entity, generate a concise summary for every pair that highlights their relation clearly.
+**Note**: Summarize each relation only from its own descriptions.
+
+Return in JSON format only, mapping every key to the summary of its relation, as follows:
+{{"<key>": "<summary>", ...}}
+
+Relations:
+{relations}
+
+Output:
+"""
@@ -1,13 +1,42 @@
 import os
+from typing import Any
 
-import networkx as nx
+import numpy as np
 
 from graphrag.model import *
+from graphrag.utils.adjacency import AdjacencyGraph
+from graphrag.utils.retrieval import IVFIndex, VectorIndex, normalize
+from graphrag.utils.storage import (embeddings_path, ivf_path, load_embeddings,
+                                   load_parquet)
 
-from .utils.load import load_parquet
 
+def load_vector_index(path: str, items: list[Any], n_probe: int = 8) -> VectorIndex:
+    """Load the IVF index built for the parquet file `path`, otherwise index `items` exactly.
+    
+    Both indexes return rows of the embedding matrix, which are only the positions of `items`
+    when every item has its row. Otherwise the embeddings of `items` are gathered by position.
+    """
+    matrix = load_embeddings(embeddings_path(path)) if os.path.exists(embeddings_path(path)) else None
+    if matrix is not None and len(matrix) == len(items) and all(item.embedding is not None for item in items):
+        if os.path.exists(ivf_path(path)):
+            return IVFIndex.load(ivf_path(path), matrix, n_probe)
+        # The memory mapped matrix is indexed without gathering the rows
+        return VectorIndex(matrix)
+    return VectorIndex(embedding_matrix(items))
+
+
+def embedding_matrix(items: list[Any]) -> np.ndarray:
+    """Normalized embeddings of `items` as rows, items without embedding are never similar."""
+    dim = next((len(item.embedding) for item in items if item.embedding is not None), 0)
+    matrix = np.zeros((len(items), dim), dtype=np.float32)
+    for row, item in enumerate(items):
+        if item.embedding is not None:
+            matrix[row] = item.embedding
+    return normalize(matrix)
 
-def load_graph(data_dir: str):
+
+def load_graph(data_dir: str) -> tuple[AdjacencyGraph, list[Entity], list[Relation], list[TextUnit]]:
+    """Load an index, nodes and edges of the graph are positions in the entities and relations."""
     # Load data from parquet
     entities = load_parquet(os.path.join(data_dir, "entities.parquet"))
     relations = load_parquet(os.path.join(data_dir, "relations.parquet"))
@@ -18,19 +47,12 @@ def load_graph(data_dir: str):
     text_units = [TextUnit.from_dict(text_unit) for text_unit in text_units]
     
     # Construct graph
-    # Add node
-    graph = nx.Graph()
-    for entity in entities:
-        graph.add_node(entity.id, attr=entity)
-    
-    # Add edge
-    for relation in relations:
-        # source = relation.source
-        # target = relation.target
-        # if graph.has_edge(source, target):
-        #     graph.edges[source, target]["relations"].append(relation)
-        # else:
-        
-        graph.add_edge(relation.source, relation.target, attr=relation)
-    
-    return graph, entities, text_units
\ No newline at end of file
+    graph = AdjacencyGraph.load(data_dir) if AdjacencyGraph.exists(data_dir) else None
+    if graph is None or graph.num_nodes != len(entities):
+        # Indexes built without the adjacency arrays
+        graph = AdjacencyGraph.from_ids(
+            [entity.id for entity in entities],
+            [relation.source for relation in relations],
+            [relation.target for relation in relations],
+        )
+    return graph, entities, relations, text_units
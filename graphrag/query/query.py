@@ -1,6 +1,7 @@
 import logging
+import os
 
-from graphrag.llm import LLM
+from graphrag.llm import LLM, Priority, run_sync
 from graphrag.prompts.query.generate import (ADDITIONAL_INFO_PROMPT,
                                              ATTRIBUTE_EXTRACT,
                                              EKG_ANSWER_PROMPT,
@@ -8,98 +9,142 @@ from graphrag.prompts.query.generate import (ADDITIONAL_INFO_PROMPT,
                                              TEXT_ANSWER_PROMPT)
 from graphrag.utils.transform import str2json
 
-from .loader import load_graph
+from .loader import embedding_matrix, load_graph, load_vector_index
 from .retrieval import *
 
 
-def generate(query: str, llm: LLM, data_dir: str, threshold: float):
-    # Load data and construct graph
-    graph, entities, text_units = load_graph(data_dir)
-    id2ent = {entity.id: entity for entity in entities}
-    name2ent = {entity.name: entity for entity in entities}
-    id2text_units = {text_unit.id: text_unit for text_unit in text_units}
+class QueryEngine:
+    """Answer questions over an index, which is loaded once and kept in memory between queries."""
+    def __init__(self,
+                 llm: LLM,
+                 data_dir: str,
+                 threshold: float,
+                 n_probe: int = 8,
+                 max_hops: int | None = None,
+                 max_nodes: int | None = None) -> None:
+        self._llm = llm
+        self._threshold = threshold
+        # Bounds of the subgraph expanded from the retrieved entities
+        self._max_hops = max_hops
+        self._max_nodes = max_nodes
+        # Load data and construct graph
+        self.graph, self.entities, self.relations, self.text_units = load_graph(data_dir)
+        self._id2ent = {entity.id: entity for entity in self.entities}
+        # Node of each entity, nodes are positions in `entities`
+        self._id2node = {entity.id: node for node, entity in enumerate(self.entities)}
+        self._aliases = [
+            [self._id2node[alias] for alias in entity.alias or [] if alias in self._id2node]
+            for entity in self.entities
+        ]
+        self._relation_embeddings = embedding_matrix(self.relations)
+        self._name2ent = {entity.name: entity for entity in self.entities}
+        self._id2text_units = {text_unit.id: text_unit for text_unit in self.text_units}
+        # Built once for all queries, `n_probe` trades recall for latency of IVF indexes
+        self._entity_index = load_vector_index(os.path.join(data_dir, "entities.parquet"), self.entities, n_probe)
+        self._text_unit_index = load_vector_index(
+            os.path.join(data_dir, "text_units.parquet"), self.text_units, n_probe
+        )
     
-    # Extract entities from query
-    extracted_entities = extract_entities(query, llm)
-    # logging.info("Extracted entities: %s", ", ".join(extracted_entities))
-    # Retrieve entity from entity set
-    retrieved_entities = retrieve_entities(query, extracted_entities, entities)
-    # logging.info("Retrieved entities: %s", ", ".join(entity.name for entity in retrieved_entities))
-    nodes = [entity.id for entity in retrieved_entities]
-    if not nodes:
-        # Become Text RAG
-        contexts = retrieve_text_units(
+    def query(self, query: str):
+        # Questions are answered ahead of bulk traffic sharing the same API key
+        session = self._llm.session(priority=Priority.INTERACTIVE)
+        
+        # Extract entities from query
+        extracted_entities = extract_entities(query, self._llm)
+        # logging.info("Extracted entities: %s", ", ".join(extracted_entities))
+        # Retrieve entity from entity set
+        retrieved_entities = retrieve_entities(query, extracted_entities, self.entities, index=self._entity_index)
+        # logging.info("Retrieved entities: %s", ", ".join(entity.name for entity in retrieved_entities))
+        nodes = [self._id2node[entity.id] for entity in retrieved_entities]
+        if not nodes:
+            # Become Text RAG
+            contexts = retrieve_text_units(
+                query,
+                self.text_units,
+                index=self._text_unit_index,
+                top_k=7,
+            )[0]
+            response = run_sync(session.single_turn(TEXT_ANSWER_PROMPT.format(question=query, context="\n".join(contexts))))
+            # logging.info(f"Context:\n%s", str(contexts))
+            # logging.info(f"Response:\n%s", response)
+            return contexts, response
+        # Retrieve subgraph
+        subgraph_nodes, subgraph_edges = retrieve_subgraph(
             query,
-            text_units,
-            top_k=7,
-        )[0]
-        response = llm.single_turn(TEXT_ANSWER_PROMPT.format(question=query, context="\n".join(contexts)))
-        # logging.info(f"Context:\n%s", str(contexts))
-        # logging.info(f"Response:\n%s", response)
-        return contexts, response
-    # Retrieve subgraph
-    subgraph = retrieve_subgraph(query, graph, nodes, threshold)
-    # Constrcut context
-    kg_context = {"entities": [], "relations": []}
-    kg_context = {
-        "entities": [id2ent[entity].name for entity in subgraph.nodes()],
-        "relations": [
-            {
-                "source": id2ent[u].name,
-                "target": id2ent[v].name,
-                "relation": subgraph.edges[u, v]["attr"].description
-            }
-            for u, v in subgraph.edges()
-        ]
-    }
-    llm.reset()  # Just in case
-    response = llm.multi_turn(
-        KG_JUDGE_PROMPT.format(knowledge_graph=str(kg_context), question=query),
-    )
-    if response == "YES":
-        response = llm.multi_turn(EKG_ANSWER_PROMPT.format(knowledge_graph=str(kg_context), question=query))
-        # logging.info(f"Context:\n%s", str(kg_context))
-        # logging.info(f"Response:\n%s", response)
-        return kg_context, response
-    # Extract attributes of entity required
-    response = llm.multi_turn(ADDITIONAL_INFO_PROMPT.format(question=query, knowledge_graph=kg_context))
-    response = str2json(response)
-    extracted_attrs = {}
-    for entity, attributes in response.items():
-        if entity not in kg_context["entities"] or not attributes or not name2ent[entity].text_units:
-            continue
-        text_units4ent = [
-            id2text_units[text_unit_id]
-            for text_unit_id in name2ent[entity].text_units
-        ]
-        # TODO: improve text retrieval quality.
-        contexts = retrieve_text_units(
-            [f"{entity}: {attribute}" for attribute in attributes],
-            text_units4ent,
-            # threshold=threshold
-            top_k=3,
+            self.graph,
+            nodes,
+            self._relation_embeddings,
+            self._aliases,
+            self._threshold,
+            max_hops=self._max_hops,
+            max_nodes=self._max_nodes,
         )
-        extracted_attrs[entity] = []
-        for i, attribute in enumerate(attributes):
-            # logging.info("%s: %s", entity, attribute)
-            # logging.info("Context:\n%s", "\n".join(contexts[i]))
-            response = llm.multi_turn(
-                ATTRIBUTE_EXTRACT.format(entity=entity, attribute=attribute, context="\n".join(contexts[i]))
+        subgraph_entities = [self.entities[node] for node in subgraph_nodes.tolist()]
+        # Constrcut context
+        kg_context = {"entities": [], "relations": []}
+        kg_context = {
+            "entities": [entity.name for entity in subgraph_entities],
+            "relations": [
+                {
+                    "source": self._id2ent[self.relations[edge].source].name,
+                    "target": self._id2ent[self.relations[edge].target].name,
+                    "relation": self.relations[edge].description
+                }
+                for edge in subgraph_edges.tolist()
+            ]
+        }
+        response = run_sync(session.multi_turn(
+            KG_JUDGE_PROMPT.format(knowledge_graph=str(kg_context), question=query),
+        ))
+        if response == "YES":
+            response = run_sync(session.multi_turn(EKG_ANSWER_PROMPT.format(knowledge_graph=str(kg_context), question=query)))
+            # logging.info(f"Context:\n%s", str(kg_context))
+            # logging.info(f"Response:\n%s", response)
+            return kg_context, response
+        # Extract attributes of entity required
+        response = run_sync(session.multi_turn(ADDITIONAL_INFO_PROMPT.format(question=query, knowledge_graph=kg_context)))
+        response = str2json(response)
+        extracted_attrs = {}
+        for entity, attributes in response.items():
+            if entity not in kg_context["entities"] or not attributes or not self._name2ent[entity].text_units:
+                continue
+            text_units4ent = [
+                self._id2text_units[text_unit_id]
+                for text_unit_id in self._name2ent[entity].text_units
+            ]
+            # TODO: improve text retrieval quality.
+            contexts = retrieve_text_units(
+                [f"{entity}: {attribute}" for attribute in attributes],
+                text_units4ent,
+                # threshold=threshold
+                top_k=3,
             )
-            if "NO" in response:
-                extracted_attrs[entity].append(contexts[i][0])
-            else:
-                extracted_attrs[entity].append(response)
-    kg_context["entities"] = []
-    for entity in subgraph.nodes():
-        kg_context["entities"].append({
-            "name": id2ent[entity].name
-        })
-        if extracted_attrs.get(id2ent[entity].name):
-            kg_context["entities"][-1]["information"] = extracted_attrs.get(id2ent[entity].name)
-    contexts = str(kg_context)
-    response = llm.multi_turn(EKG_ANSWER_PROMPT.format(knowledge_graph=contexts, question=query))
-    # logging.info("Context:\n%s", contexts)
-    messages = "\n".join([f"{turn['role']}: {turn['content']}" for turn in llm.messages if turn["role"] == "assistant"])
-    # logging.info("Response:\n%s", messages)
-    return contexts, response.replace("\n\n", "\n")
\ No newline at end of file
+            extracted_attrs[entity] = []
+            for i, attribute in enumerate(attributes):
+                # logging.info("%s: %s", entity, attribute)
+                # logging.info("Context:\n%s", "\n".join(contexts[i]))
+                response = run_sync(session.multi_turn(
+                    ATTRIBUTE_EXTRACT.format(entity=entity, attribute=attribute, context="\n".join(contexts[i]))
+                ))
+                if "NO" in response:
+                    extracted_attrs[entity].append(contexts[i][0])
+                else:
+                    extracted_attrs[entity].append(response)
+        kg_context["entities"] = []
+        for entity in subgraph_entities:
+            kg_context["entities"].append({
+                "name": entity.name
+            })
+            if extracted_attrs.get(entity.name):
+                kg_context["entities"][-1]["information"] = extracted_attrs.get(entity.name)
+        contexts = str(kg_context)
+        response = run_sync(session.multi_turn(EKG_ANSWER_PROMPT.format(knowledge_graph=contexts, question=query)))
+        # logging.info("Context:\n%s", contexts)
+        messages = "\n".join([f"{turn['role']}: {turn['content']}" for turn in session.messages if turn["role"] == "assistant"])
+        # logging.info("Response:\n%s", messages)
+        return contexts, response.replace("\n\n", "\n")
+
+
+def generate(query: str, llm: LLM, data_dir: str, threshold: float):
+    """Answer a single question, use `QueryEngine` to answer several over the same index."""
+    return QueryEngine(llm, data_dir, threshold).query(query)
\ No newline at end of file
@@ -1,11 +1,14 @@
-import networkx as nx
+from collections import deque
+from typing import Iterable
+
 import numpy as np
 
 from graphrag.llm import LLM
 from graphrag.model import Entity, TextUnit
 from graphrag.prompts.query.entity_extraction import ENTITY_EXTRACTION
-from graphrag.utils.embedding import get_embedding
-from graphrag.utils.retrieval import get_cos_sim_matrix, retrieve
+from graphrag.utils.adjacency import AdjacencyGraph
+from graphrag.utils.embedding import EmbeddingService
+from graphrag.utils.retrieval import VectorIndex, normalize
 from graphrag.utils.transform import str2json
 
 
@@ -14,8 +17,17 @@ def extract_entities(text: str, llm: LLM) -> list[str]:
     response = llm.single_turn(ENTITY_EXTRACTION.format(input_text=text))
     return str2json(response)
 
-def retrieve_entities(query: str, cand_entities: list[str], all_entities: list[Entity], threshold: float = 0.65) -> list[Entity]:
-    """Retrieve relevant entities from the entity set through queries and candidate entities"""
+def retrieve_entities(query: str,
+                      cand_entities: list[str],
+                      all_entities: list[Entity],
+                      threshold: float = 0.65,
+                      index: VectorIndex | None = None) -> list[Entity]:
+    """Retrieve relevant entities from the entity set through queries and candidate entities
+    
+    `index` is the index of the embeddings of `all_entities`, built on the fly if not given.
+    """
+    if index is None:
+        index = VectorIndex(np.array([entity.embedding for entity in all_entities]))
     # Retrieve entities based on candidate entities.
     name2ent = {entity.name.lower(): entity for entity in all_entities}
     retrieved_entities = set()
@@ -26,49 +38,77 @@ def retrieve_entities(query: str, cand_entities: list[str], all_entities: list[E
             retrieved_entities.add(entity.lower())
         else:
             remains.append(entity)
+    # The query and the remaining candidates are embedded together
+    embeddings = EmbeddingService.get_default().embed(remains + [query])
     if remains:
         # Retrieve most similar three entities with similarity above the threshold from entity set.
-        indices, _ = retrieve(
-            query=np.array(get_embedding(remains)),
-            target=np.array([entity.embedding for entity in all_entities]),
-            top_k=3,
-            threshold=threshold,
-        )
+        indices, _ = index.search(embeddings[:-1], top_k=3, threshold=threshold)
         retrieved_entities.update(all_entities[id].name.lower() for ids in indices for id in ids)
     
     # Retrieve entities based on query.
-    query_embedding = np.array(get_embedding(query))
-    entities_embedding = np.array([entity.embedding for entity in all_entities])
     # Retrieve entities with similarity above the threshold from entity set. 
-    indices, _ = retrieve(query_embedding, entities_embedding, threshold=threshold)
+    indices, _ = index.search(embeddings[-1:], threshold=threshold)
     retrieved_entities.update(all_entities[id].name.lower() for id in indices[0])
     return [name2ent[name] for name in retrieved_entities]
 
-def retrieve_subgraph(query: str, graph: nx.Graph, nodes: list[str], threshold: float=0.65) -> nx.Graph:
-    query_embedding = np.array(get_embedding(query))
-    cur_idx = 0
-    while cur_idx < len(nodes):
-        u = nodes[cur_idx]
-        # Traverse neighboring nodes
-        for v in graph.neighbors(u):
-            # Not visited before
-            if v not in nodes:
-                # Add neighbor node v which possess relation with node u, relating to query
-                embeddings = np.array([graph.edges[u, v]["attr"].embedding])
-                if get_cos_sim_matrix(query_embedding, embeddings)[0][0] > threshold:
-                    nodes.append(v)
-        # Add similar entity node
-        if graph.nodes[u]["attr"].alias:
-            for alias in graph.nodes[u]["attr"].alias:
-                if alias not in nodes:
-                    nodes.append(alias)
-        cur_idx += 1
-    return graph.subgraph(nodes)
+def retrieve_subgraph(query: str,
+                      graph: AdjacencyGraph,
+                      nodes: list[int],
+                      relation_embeddings: np.ndarray,
+                      aliases: list[list[int]] | None = None,
+                      threshold: float = 0.65,
+                      max_hops: int | None = None,
+                      max_nodes: int | None = None) -> tuple[np.ndarray, np.ndarray]:
+    """Expand `nodes` hop by hop along the relations similar to the query, and their aliases.
+    
+    The relations incident to a hop are scored in a single product with `relation_embeddings`,
+    the normalized embeddings indexed by edge. `aliases` are the aliases of each node. Expansion
+    stops after `max_hops` hops or once the subgraph has `max_nodes` nodes, closest relations
+    first. Return the nodes of the subgraph and the edges between them, in ascending order.
+    """
+    query_embedding = normalize(EmbeddingService.get_default().embed([query]))[0]
+    visited = np.zeros(graph.num_nodes, dtype=bool)
+    num_visited = 0
+    
+    def visit(candidates: Iterable[int]) -> list[int]:
+        """Visit `candidates` and their aliases, return the nodes visited for the first time."""
+        nonlocal num_visited
+        visited_now = []
+        queue = deque(candidates)
+        while queue and (max_nodes is None or num_visited < max_nodes):
+            node = queue.popleft()
+            if visited[node]:
+                continue
+            visited[node] = True
+            num_visited += 1
+            visited_now.append(node)
+            # Aliases are the same entity, they are reached without a hop
+            if aliases is not None:
+                queue.extend(aliases[node])
+        return visited_now
+    
+    frontier = visit(nodes)
+    hops = 0
+    while frontier and (max_hops is None or hops < max_hops):
+        neighbors, edges = graph.incident(frontier)
+        unvisited = ~visited[neighbors]
+        neighbors, edges = neighbors[unvisited], edges[unvisited]
+        if not len(edges):
+            break
+        similarities = relation_embeddings[edges] @ query_embedding
+        order = np.argsort(-similarities, kind="stable")
+        order = order[similarities[order] > threshold]
+        frontier = visit(neighbors[order].tolist())
+        hops += 1
+    subgraph_nodes = np.flatnonzero(visited)
+    return subgraph_nodes, graph.subgraph_edges(subgraph_nodes)
 
-def retrieve_text_units(queries: list[str], text_units: list[TextUnit], **kwds) -> list[list[str]]:
-    indices, _ = retrieve(
-        np.array(get_embedding(queries)),
-        np.array([text_unit.embedding for text_unit in text_units]),
-        **kwds
-    )
+def retrieve_text_units(queries: list[str],
+                        text_units: list[TextUnit],
+                        index: VectorIndex | None = None,
+                        **kwds) -> list[list[str]]:
+    """`index` is the index of the embeddings of `text_units`, built on the fly if not given."""
+    if index is None:
+        index = VectorIndex(np.array([text_unit.embedding for text_unit in text_units]))
+    indices, _ = index.search(EmbeddingService.get_default().embed(queries), **kwds)
     return [[text_units[id].content for id in ids] for ids in indices]
\ No newline at end of file
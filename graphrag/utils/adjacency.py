@@ -0,0 +1,89 @@
+import os
+
+import numpy as np
+
+from graphrag.utils.storage import save_npy
+
+
+class AdjacencyGraph:
+    """Undirected graph in compressed sparse row form, nodes and edges are integers.
+    
+    Node `i` is the `i`-th entity of `entities.parquet`, edge `e` the `e`-th relation of
+    `relations.parquet`. The neighbours of node `i` are `neighbors[offsets[i]:offsets[i+1]]`,
+    reached through the edges at the same positions of `edges`. The arrays are saved as `.npy`
+    files and memory mapped when loaded.
+    """
+    _arrays = ("offsets", "neighbors", "edges")
+    
+    def __init__(self, offsets: np.ndarray, neighbors: np.ndarray, edges: np.ndarray) -> None:
+        self.offsets = offsets
+        self.neighbors = neighbors
+        self.edges = edges
+    
+    @property
+    def num_nodes(self) -> int:
+        return len(self.offsets) - 1
+    
+    @classmethod
+    def build(cls, sources: np.ndarray, targets: np.ndarray, num_nodes: int) -> "AdjacencyGraph":
+        """Build from the end nodes of each edge, edges are numbered in the given order.
+        
+        Edges with a negative end node are left out, their numbers are not reused.
+        """
+        sources = np.asarray(sources, dtype=np.int64)
+        targets = np.asarray(targets, dtype=np.int64)
+        edge_ids = np.arange(len(sources), dtype=np.int64)
+        known = (sources >= 0) & (targets >= 0)
+        sources, targets, edge_ids = sources[known], targets[known], edge_ids[known]
+        # Every edge is listed from both ends, self-loops only once
+        loops = sources == targets
+        heads = np.concatenate([sources, targets[~loops]])
+        tails = np.concatenate([targets, sources[~loops]])
+        edge_ids = np.concatenate([edge_ids, edge_ids[~loops]])
+        order = np.lexsort((edge_ids, heads))
+        offsets = np.zeros(num_nodes + 1, dtype=np.int64)
+        np.cumsum(np.bincount(heads, minlength=num_nodes), out=offsets[1:])
+        return cls(offsets, tails[order], edge_ids[order])
+    
+    @classmethod
+    def from_ids(cls, node_ids: list[str], sources: list[str], targets: list[str]) -> "AdjacencyGraph":
+        """Build from the ids of the nodes and the ids of the end nodes of each edge."""
+        index = {node_id: i for i, node_id in enumerate(node_ids)}
+        return cls.build(
+            [index.get(source, -1) for source in sources],
+            [index.get(target, -1) for target in targets],
+            len(node_ids),
+        )
+    
+    @staticmethod
+    def _path(directory: str, name: str) -> str:
+        return os.path.join(directory, f"graph.{name}.npy")
+    
+    @classmethod
+    def exists(cls, directory: str) -> bool:
+        return all(os.path.exists(cls._path(directory, name)) for name in cls._arrays)
+    
+    def save(self, directory: str):
+        for name in self._arrays:
+            save_npy(self._path(directory, name), getattr(self, name))
+    
+    @classmethod
+    def load(cls, directory: str) -> "AdjacencyGraph":
+        return cls(*(np.load(cls._path(directory, name), mmap_mode="r") for name in cls._arrays))
+    
+    def incident(self, nodes: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Return the neighbours of `nodes` and the edges leading to them, node after node."""
+        nodes = np.asarray(nodes, dtype=np.int64)
+        starts, ends = self.offsets[nodes], self.offsets[nodes + 1]
+        counts = ends - starts
+        # Positions of all the neighbours of `nodes` in one gather
+        positions = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+        return self.neighbors[positions], self.edges[positions]
+    
+    def subgraph_edges(self, nodes: np.ndarray) -> np.ndarray:
+        """Return the edges between `nodes` in ascending order."""
+        nodes = np.asarray(nodes, dtype=np.int64)
+        members = np.zeros(self.num_nodes, dtype=bool)
+        members[nodes] = True
+        neighbors, edges = self.incident(nodes)
+        return np.unique(edges[members[neighbors]])
@@ -1,10 +1,134 @@
+import hashlib
 import os
-from urllib import response
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
+import numpy as np
+import tiktoken
 from openai import OpenAI
 
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+
+class EmbeddingCache:
+    """Embedding vectors stored in SQLite as float32 blobs, keyed by model and content hash."""
+    def __init__(self, path: str) -> None:
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)")
+        self._conn.commit()
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def key(model_name: str, text: str) -> str:
+        return hashlib.sha256(f"{model_name}\0{text}".encode()).hexdigest()
+    
+    def get_many(self, keys: list[str]) -> dict[str, np.ndarray]:
+        found = {}
+        with self._lock:
+            # Stay below the SQLite limit of bound parameters
+            for i in range(0, len(keys), 500):
+                batch = keys[i:i+500]
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(batch))})", batch
+                ).fetchall()
+                found.update((key, np.frombuffer(vector, dtype=np.float32)) for key, vector in rows)
+        return found
+    
+    def set_many(self, items: dict[str, np.ndarray]):
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                [(key, vector.astype(np.float32).tobytes()) for key, vector in items.items()],
+            )
+            self._conn.commit()
+    
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class EmbeddingService:
+    """Embed texts with deduplication, an optional disk cache and concurrent size-limited batches."""
+    _default: "EmbeddingService | None" = None
+    
+    def __init__(self,
+                 model_name: str = "text-embedding-3-small",
+                 batch_size: int = 512,
+                 max_batch_tokens: int = 100_000,
+                 max_workers: int = 8,
+                 cache_path: str | None = None,
+                 encoding_name: str = "cl100k_base") -> None:
+        self.model_name = model_name
+        self._batch_size = batch_size
+        self._max_batch_tokens = max_batch_tokens
+        self._max_workers = max_workers
+        self._cache = EmbeddingCache(cache_path) if cache_path else None
+        self._encoding = tiktoken.get_encoding(encoding_name)
+        self._client: OpenAI | None = None
+    
+    @classmethod
+    def get_default(cls) -> "EmbeddingService":
+        if cls._default is None:
+            cls._default = EmbeddingService()
+        return cls._default
+    
+    @classmethod
+    def set_default(cls, service: "EmbeddingService"):
+        cls._default = service
+    
+    @property
+    def client(self) -> OpenAI:
+        # Created on first use, so importing this module needs no API key
+        if self._client is None:
+            self._client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        return self._client
+    
+    def _batches(self, texts: list[str]) -> list[list[str]]:
+        """Group texts so that each request stays within the input count and token limits."""
+        batches = [[]]
+        num_tokens = 0
+        for text in texts:
+            length = len(self._encoding.encode(text))
+            if batches[-1] and (len(batches[-1]) >= self._batch_size or num_tokens + length > self._max_batch_tokens):
+                batches.append([])
+                num_tokens = 0
+            batches[-1].append(text)
+            num_tokens += length
+        return [batch for batch in batches if batch]
+    
+    def _request(self, texts: list[str]) -> np.ndarray:
+        response = self.client.embeddings.create(input=texts, model=self.model_name)
+        return np.array([data.embedding for data in response.data], dtype=np.float32)
+    
+    def embed(self, texts: str | list[str]) -> np.ndarray:
+        """Return a float32 matrix with one row per text."""
+        if isinstance(texts, str):
+            texts = [texts]
+        # Identical texts are embedded once
+        unique_texts = list(dict.fromkeys(texts))
+        vectors: dict[str, np.ndarray] = {}
+        if self._cache:
+            keys = {text: EmbeddingCache.key(self.model_name, text) for text in unique_texts}
+            cached = self._cache.get_many(list(keys.values()))
+            vectors = {text: cached[key] for text, key in keys.items() if key in cached}
+        
+        missing = [text for text in unique_texts if text not in vectors]
+        if missing:
+            batches = self._batches(missing)
+            with ThreadPoolExecutor(max_workers=self._max_workers) as executor:
+                for batch, embeddings in zip(batches, executor.map(self._request, batches)):
+                    vectors.update(zip(batch, embeddings))
+            if self._cache:
+                self._cache.set_many({keys[text]: vectors[text] for text in missing})
+        
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+        return np.stack([vectors[text] for text in texts])
+
 
 def get_embedding(text: str | list[str], model_name: str = "text-embedding-3-small") -> list[list[float]]:
-    response =  client.embeddings.create(input=text, model=model_name)
-    return [data.embedding for data in response.data]
\ No newline at end of file
+    service = EmbeddingService.get_default()
+    if model_name != service.model_name:
+        service = EmbeddingService(model_name)
+    return service.embed(text).tolist()
@@ -1,3 +1,5 @@
+from typing import Iterator
+
 import numpy as np
 
 
@@ -8,27 +10,184 @@ def get_cos_sim_matrix(x: np.array, y: np.array) -> np.array:
     cos_sim_matrix =  (x @ y.T) / (x_norms @ y_norms.T)
     return cos_sim_matrix
 
-def retrieve(query: np.array, target: np.array, **kwds) -> tuple[list[list[int]], list[list[float]]]:
-    cos_sim_matrix = get_cos_sim_matrix(query, target)
+def normalize(x: np.array) -> np.ndarray:
+    """Scale the rows of `x` to unit length as float32, dot products are then cosine similarities."""
+    x = np.asarray(x, dtype=np.float32)
+    norms = np.linalg.norm(x, axis=1, keepdims=True)
+    # Zero vectors stay zero instead of becoming NaN
+    norms[norms == 0] = 1
+    return x / norms
+
+class VectorIndex:
+    """Cosine similarity search over a fixed set of vectors.
     
-    indices = []
-    similarities = []
-    top_k = kwds.get("top_k", None)
-    threshold = kwds.get("threshold", None)
+    Vectors are normalized to float32 once, a search is then a single matrix product for all
+    queries, computed `block_size` queries at a time to bound memory. The normalized matrix is
+    the only copy made, e.g. a memory mapped matrix is normalized a block at a time.
+    """
+    def __init__(self, vectors: np.array, block_size: int = 256) -> None:
+        if not isinstance(vectors, np.ndarray):
+            vectors = np.asarray(vectors, dtype=np.float32)
+        self._matrix = np.empty(vectors.shape if vectors.size else (0, 0), dtype=np.float32)
+        for i in range(0, len(self._matrix), 4096):
+            self._matrix[i:i+4096] = normalize(vectors[i:i+4096])
+        self._block_size = block_size
     
-    for cos_sim in cos_sim_matrix:
+    def __len__(self) -> int:
+        return len(self._matrix)
+    
+    @staticmethod
+    def _select(sims: np.ndarray,
+                ids: np.ndarray,
+                top_k: int | None,
+                threshold: float | None) -> tuple[list[list[int]], list[list[float]]]:
+        """Select the matches of each row of `sims`, the similarities to the vectors `ids`."""
         if top_k is not None:
-            top_indices = np.argsort(cos_sim)[-top_k:][::-1]
-            top_similarities = cos_sim[top_indices]
+            k = min(top_k, sims.shape[1])
+            # Only the top k of each row are sorted
+            top = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+            top_sims = np.take_along_axis(sims, top, axis=1)
+            order = np.argsort(-top_sims, axis=1, kind="stable")
+            top = ids[np.take_along_axis(top, order, axis=1)]
+            top_sims = np.take_along_axis(top_sims, order, axis=1)
         else:
-            top_indices = np.arange(len(cos_sim))
-            top_similarities = cos_sim
+            top = np.broadcast_to(ids, sims.shape)
+            top_sims = sims
+        
+        mask = top_sims >= threshold if threshold is not None else np.ones(top_sims.shape, dtype=bool)
+        indices = [row[row_mask].tolist() for row, row_mask in zip(top, mask)]
+        similarities = [row_sims[row_mask].tolist() for row_sims, row_mask in zip(top_sims, mask)]
+        return indices, similarities
+    
+    def search(self,
+               queries: np.array,
+               top_k: int | None = None,
+               threshold: float | None = None) -> tuple[list[list[int]], list[list[float]]]:
+        """Return the indices and similarities of the matches of each query.
         
-        if threshold is not None:
-            mask = top_similarities >= threshold
-            top_indices = top_indices[mask]
-            top_similarities = top_similarities[mask]
+        With `top_k`, matches are the `top_k` most similar vectors in descending order, otherwise
+        all vectors in index order. With `threshold`, only matches reaching it are kept.
+        """
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        if not len(self):
+            return [[] for _ in queries], [[] for _ in queries]
+        queries = normalize(queries)
         
-        indices.append(top_indices.tolist())
-        similarities.append(top_similarities.tolist())
-    return indices, similarities
\ No newline at end of file
+        indices, similarities = [], []
+        ids = np.arange(len(self._matrix))
+        for i in range(0, len(queries), self._block_size):
+            block_indices, block_similarities = self._select(
+                queries[i:i+self._block_size] @ self._matrix.T, ids, top_k, threshold
+            )
+            indices.extend(block_indices)
+            similarities.extend(block_similarities)
+        return indices, similarities
+
+class IVFIndex(VectorIndex):
+    """Approximate cosine similarity search with an inverted file index.
+    
+    Vectors are clustered into `n_lists` lists by spherical k-means, a query only scans the
+    vectors of the `n_probe` lists with the closest centroids. A larger `n_probe` gives a higher
+    recall at a higher latency. The vectors are not copied, e.g. a memory mapped matrix is only
+    read for the lists that are scanned.
+    """
+    def __init__(self,
+                 vectors: np.array,
+                 n_lists: int | None = None,
+                 n_probe: int = 8,
+                 n_iter: int = 10,
+                 seed: int = 0,
+                 block_size: int = 4096) -> None:
+        self._vectors = vectors if isinstance(vectors, np.ndarray) else np.asarray(vectors, dtype=np.float32)
+        vectors = self._vectors
+        self._block_size = block_size
+        self.n_probe = n_probe
+        if not len(vectors):
+            self._centroids = np.empty((0, 0), dtype=np.float32)
+            self._offsets = np.zeros(1, dtype=np.int64)
+            self._ids = np.empty(0, dtype=np.int64)
+            return
+        n_lists = min(n_lists or int(4 * np.sqrt(len(vectors))), len(vectors))
+        
+        # Train the centroids on a sample, then assign every vector to its closest centroid
+        rng = np.random.default_rng(seed)
+        sample = normalize(vectors[np.sort(rng.choice(len(vectors), min(len(vectors), 64 * n_lists), replace=False))])
+        centroids = sample[rng.choice(len(sample), n_lists, replace=False)]
+        for _ in range(n_iter):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            counts = np.bincount(assignment, minlength=n_lists)
+            order = np.argsort(assignment, kind="stable")
+            sums = np.zeros_like(centroids)
+            filled = counts > 0
+            sums[filled] = np.add.reduceat(sample[order], np.cumsum(counts)[filled] - counts[filled])
+            empty = np.flatnonzero(~filled)
+            # Lists left empty restart from random sample vectors
+            sums[empty] = sample[rng.choice(len(sample), len(empty))]
+            centroids = normalize(sums)
+        self._centroids = centroids
+        
+        assignment = np.concatenate([
+            np.argmax(normalize(vectors[i:i+block_size]) @ centroids.T, axis=1)
+            for i in range(0, len(vectors), block_size)
+        ])
+        self._ids = np.argsort(assignment, kind="stable")
+        self._offsets = np.concatenate([[0], np.cumsum(np.bincount(assignment, minlength=n_lists))])
+    
+    def __len__(self) -> int:
+        return len(self._ids)
+    
+    def save(self, path: str):
+        np.savez(path, centroids=self._centroids, offsets=self._offsets, ids=self._ids)
+    
+    @classmethod
+    def load(cls, path: str, vectors: np.array, n_probe: int = 8, block_size: int = 4096) -> "IVFIndex":
+        """Load the lists saved in `path`, `vectors` are the vectors the index was built from."""
+        index = cls.__new__(cls)
+        index._vectors = vectors
+        index._block_size = block_size
+        index.n_probe = n_probe
+        with np.load(path) as data:
+            index._centroids = data["centroids"]
+            index._offsets = data["offsets"]
+            index._ids = data["ids"]
+        return index
+    
+    def _members(self, lists: np.ndarray) -> np.ndarray:
+        """Ids of the vectors in `lists`, in index order."""
+        return np.sort(np.concatenate([self._ids[self._offsets[l]:self._offsets[l+1]] for l in lists]))
+    
+    def _probe(self, vectors: np.ndarray) -> np.ndarray:
+        """The `n_probe` lists closest to each of the normalized `vectors`."""
+        n_probe = min(self.n_probe, len(self._centroids))
+        return np.argpartition(-(vectors @ self._centroids.T), n_probe - 1, axis=1)[:, :n_probe]
+    
+    def search(self,
+               queries: np.array,
+               top_k: int | None = None,
+               threshold: float | None = None) -> tuple[list[list[int]], list[list[float]]]:
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        if not len(self):
+            return [[] for _ in queries], [[] for _ in queries]
+        queries = normalize(queries)
+        
+        indices, similarities = [], []
+        for query, lists in zip(queries, self._probe(queries)):
+            ids = self._members(lists)
+            sims = (normalize(self._vectors[ids]) @ query)[None, :]
+            query_indices, query_similarities = self._select(sims, ids, top_k, threshold)
+            indices.extend(query_indices)
+            similarities.extend(query_similarities)
+        return indices, similarities
+    
+    def candidate_blocks(self) -> Iterator[tuple[np.ndarray, np.ndarray]]:
+        """Yield the ids of each list with the ids of the lists probed from its centroid.
+        
+        Every pair of similar vectors likely appears in one block, which is how all similar pairs
+        are found without comparing every pair.
+        """
+        for l, lists in enumerate(self._probe(self._centroids)):
+            if self._offsets[l] < self._offsets[l+1]:
+                yield self._members([l]), self._members(lists)
+
+def retrieve(query: np.array, target: np.array, **kwds) -> tuple[list[list[int]], list[list[float]]]:
+    return VectorIndex(target).search(query, top_k=kwds.get("top_k", None), threshold=kwds.get("threshold", None))
\ No newline at end of file
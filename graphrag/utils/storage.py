@@ -0,0 +1,45 @@
+import os
+from typing import Any
+
+import numpy as np
+import pandas as pd
+
+
+def embeddings_path(path: str) -> str:
+    """Path of the embedding matrix stored next to the parquet file `path`."""
+    return f"{os.path.splitext(path)[0]}.embeddings.npy"
+
+def ivf_path(path: str) -> str:
+    """Path of the approximate nearest-neighbour index of the embeddings of the parquet file `path`."""
+    return f"{os.path.splitext(path)[0]}.ivf.npz"
+
+def save_npy(path: str, array: np.ndarray):
+    """Save `array` to `path` atomically, readers see either the previous or the new array."""
+    # Written under another name first, the previous file may still be memory mapped
+    tmp_path = f"{path}.tmp.npy"
+    np.save(tmp_path, array)
+    os.replace(tmp_path, path)
+
+def save_embeddings(path: str, embeddings: list[Any]):
+    """Save embeddings as one contiguous float32 matrix."""
+    save_npy(path, np.asarray(embeddings, dtype=np.float32) if embeddings else np.empty((0, 0), dtype=np.float32))
+
+def load_embeddings(path: str) -> np.ndarray:
+    """Memory map the embedding matrix, rows are only read from disk when used."""
+    return np.load(path, mmap_mode="r")
+
+def load_parquet(path) -> list[dict[str, Any]]:
+    records = pd.read_parquet(path, engine="pyarrow").to_dict(orient="records")
+    embeddings = load_embeddings(embeddings_path(path)) if os.path.exists(embeddings_path(path)) else None
+    for record in records:
+        for k, v in record.items():
+            if k == "embedding" and isinstance(v, np.ndarray):
+                # Embeddings of indexes without an embedding matrix
+                record[k] = v.astype(np.float32)
+            elif isinstance(v, (np.ndarray, pd.Series)):
+                record[k] = v.tolist()
+        if embeddings is not None:
+            # Each embedding is a view of its row in the matrix, nothing is copied
+            row = record.pop("embedding_row", -1)
+            record["embedding"] = embeddings[row] if row >= 0 else None
+    return records